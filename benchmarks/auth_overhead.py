@@ -0,0 +1,42 @@
+"""Token verification cost per authenticated request.
+
+Before the verified-token cache a books route that depends on both the
+access token bearer and RoleChecker ran the bearer twice, and each run
+decoded the JWT twice. Run with the app's environment configured (.env):
+
+    python -m benchmarks.auth_overhead --requests 20000
+"""
+from src.auth.utils import create_access_token, decode_token, decode_token_cached
+import argparse
+import time
+
+DECODES_PER_REQUEST = 4
+
+
+def per_request(verify, token: str, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        verify(token)
+    return (time.perf_counter() - started) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = create_access_token(
+        {"email": "a@b.com", "user_uid": "1", "user_role": "user", "is_verified": True}
+    )
+
+    def uncached(token):
+        for _ in range(DECODES_PER_REQUEST):
+            decode_token(token)
+
+    for name, verify in (("uncached", uncached), ("cached", decode_token_cached)):
+        seconds = per_request(verify, token, args.requests)
+        print(f"{name:9} {seconds * 1_000_000:8.2f}us per request")
+
+
+if __name__ == "__main__":
+    main()
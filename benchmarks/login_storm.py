@@ -0,0 +1,80 @@
+"""Latency of an unrelated endpoint while a burst of logins hashes passwords.
+
+Compares bcrypt verification run inline on the event loop (the old login
+path) with verification on the password hash pool. Run with the app's
+environment configured (.env), e.g.:
+
+    python -m benchmarks.login_storm --logins 40 --probes 200
+"""
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from src.auth.utils import generate_passwd_hash, verify_password, verify_password_async
+import argparse
+import asyncio
+import statistics
+import time
+
+PASSWORD = "helloworld1"
+PASSWORD_HASH = generate_passwd_hash(PASSWORD)
+PROBE_INTERVAL = 0.01
+
+app = FastAPI()
+
+
+@app.post("/login-inline")
+async def login_inline():
+    return {"valid": verify_password(PASSWORD, PASSWORD_HASH)}
+
+
+@app.post("/login-pooled")
+async def login_pooled():
+    return {"valid": await verify_password_async(PASSWORD, PASSWORD_HASH)}
+
+
+@app.get("/ping")
+async def ping():
+    return {"pong": True}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def run(login_path: str, logins: int, probes: int) -> list[float]:
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+
+        async def probe():
+            # probes are fired on a fixed schedule and timed from when they
+            # were due, so time spent waiting on a blocked loop is counted
+            started = time.perf_counter()
+            for i in range(probes):
+                due = started + i * PROBE_INTERVAL
+                await asyncio.sleep(max(0, due - time.perf_counter()))
+                await client.get("/ping")
+                latencies.append(time.perf_counter() - due)
+
+        storm = [client.post(login_path) for _ in range(logins)]
+        await asyncio.gather(probe(), *storm)
+        return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--probes", type=int, default=200)
+    args = parser.parse_args()
+
+    for login_path in ("/login-inline", "/login-pooled"):
+        latencies = asyncio.run(run(login_path, args.logins, args.probes))
+        print(
+            f"{login_path:14} /ping p50={statistics.median(latencies) * 1000:8.2f}ms "
+            f"p99={percentile(latencies, 99) * 1000:8.2f}ms "
+            f"max={max(latencies) * 1000:8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
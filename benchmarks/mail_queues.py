@@ -0,0 +1,165 @@
+"""Transactional email latency while a bulk broadcast is being sent.
+
+Starts real Celery workers against REDIS_URL (use a scratch Redis, the
+queues are purged) and a local aiosmtpd server that takes `--smtp-ms` per
+message (pip install aiosmtpd). It queues `--bulk-batches` welcome batches,
+then a verification email every 100ms, and reports how long those took to
+arrive with:
+
+- shared: everything on one queue, the previous setup
+- split: the transactional and bulk worker profiles
+
+    python -m benchmarks.mail_queues --bulk-batches 20 --smtp-ms 20
+"""
+from aiosmtpd.controller import Controller
+from src.celery_tasks import (
+    BULK_QUEUE,
+    TRANSACTIONAL_QUEUE,
+    WORKER_PROFILES,
+    c_app,
+    send_email_batch,
+)
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+HOST = "127.0.0.1"
+PORT = 8027
+
+
+class TimingHandler:
+    def __init__(self, smtp_seconds: float) -> None:
+        self.smtp_seconds = smtp_seconds
+        self.received = {}
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.smtp_seconds)
+        for recipient in envelope.rcpt_tos:
+            self.received[recipient] = time.perf_counter()
+        return "250 OK"
+
+
+def start_workers(commands: list[list[str]]) -> list[subprocess.Popen]:
+    env = dict(
+        os.environ,
+        MAIL_SERVER=HOST,
+        MAIL_PORT=str(PORT),
+        MAIL_SSL_TLS="false",
+        MAIL_STARTTLS="false",
+        USE_CREDENTIALS="false",
+        VALIDATE_CERTS="false",
+    )
+    workers = [
+        subprocess.Popen(
+            [sys.executable, *command],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for command in commands
+    ]
+
+    deadline = time.monotonic() + 30
+    while len(c_app.control.ping(timeout=0.5)) < len(workers):
+        if time.monotonic() > deadline:
+            raise RuntimeError("workers did not start")
+
+    return workers
+
+
+def run(
+    handler: TimingHandler, bulk_queue: str, bulk_batches: int, transactional: int
+) -> list[float]:
+    bulk = [
+        {"recipients": [f"bulk-{uuid.uuid4().hex}@example.com"], "template": "welcome"}
+        for _ in range(bulk_batches * 100)
+    ]
+    for i in range(bulk_batches):
+        send_email_batch.apply_async(
+            (bulk[i * 100 : (i + 1) * 100],), queue=bulk_queue
+        )
+
+    queued_at = {}
+    for _ in range(transactional):
+        address = f"verify-{uuid.uuid4().hex}@example.com"
+        queued_at[address] = time.perf_counter()
+        send_email_batch.apply_async(
+            (
+                [
+                    {
+                        "recipients": [address],
+                        "template": "verify_email",
+                        "context": {"link": "http://localhost/verify"},
+                    }
+                ],
+            ),
+            queue=TRANSACTIONAL_QUEUE,
+        )
+        time.sleep(0.1)
+
+    expected = set(queued_at) | {message["recipients"][0] for message in bulk}
+    while not expected <= handler.received.keys():
+        time.sleep(0.05)
+
+    return [handler.received[address] - queued_at[address] for address in queued_at]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bulk-batches", type=int, default=20)
+    parser.add_argument("--transactional", type=int, default=20)
+    parser.add_argument("--smtp-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    transactional = WORKER_PROFILES["transactional"]
+    bulk = WORKER_PROFILES["bulk"]
+    # same total concurrency and celery's default prefetch for the old setup
+    shared = [
+        "-m", "celery", "-A", "src.celery_tasks", "worker",
+        "--queues", TRANSACTIONAL_QUEUE,
+        "--concurrency", str(transactional["concurrency"] + bulk["concurrency"]),
+        "--prefetch-multiplier", "4",
+        "--hostname", "shared@%h",
+    ]
+    split = [
+        ["-m", "src.cli", "worker", "--profile", "transactional"],
+        ["-m", "src.cli", "worker", "--profile", "bulk"],
+    ]
+
+    handler = TimingHandler(args.smtp_ms / 1000)
+    controller = Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        for name, commands, bulk_queue in (
+            ("shared", [shared], TRANSACTIONAL_QUEUE),
+            ("split", split, BULK_QUEUE),
+        ):
+            c_app.control.purge()
+            workers = start_workers(commands)
+            try:
+                latencies = sorted(
+                    run(handler, bulk_queue, args.bulk_batches, args.transactional)
+                )
+            finally:
+                for worker in workers:
+                    worker.terminate()
+                for worker in workers:
+                    worker.wait()
+
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(
+                f"{name:7} transactional latency "
+                f"p50 {statistics.median(latencies) * 1000:8.1f}ms "
+                f"p95 {p95 * 1000:8.1f}ms"
+            )
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
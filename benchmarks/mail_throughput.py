@@ -0,0 +1,99 @@
+"""Email throughput of per-message sends vs the pooled batch sender.
+
+Sends to a local aiosmtpd server (pip install aiosmtpd). `--handshake-ms`
+adds latency to every EHLO to stand in for the TLS handshake and login a
+real provider costs on each new connection. Run with the app's environment
+configured (.env), e.g.:
+
+    python -m benchmarks.mail_throughput --messages 500 --handshake-ms 50
+"""
+from aiosmtpd.controller import Controller
+from asgiref.sync import async_to_sync
+from fastapi_mail import ConnectionConfig, FastMail
+from src.mail import SMTPPool, build_email, create_message
+import argparse
+import asyncio
+import time
+
+HOST = "127.0.0.1"
+PORT = 8025
+
+
+class CountingHandler:
+    def __init__(self, handshake_seconds: float) -> None:
+        self.handshake_seconds = handshake_seconds
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_seconds)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def local_config() -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="bench",
+        MAIL_PASSWORD="bench",
+        MAIL_FROM="bench@example.com",
+        MAIL_PORT=PORT,
+        MAIL_SERVER=HOST,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+    )
+
+
+def per_message(messages: int) -> None:
+    # the old send_email task: a new event loop and connection per email
+    mail = FastMail(local_config())
+    for i in range(messages):
+        message = create_message([f"user{i}@example.com"], "Verify", "<p>hi</p>")
+        async_to_sync(mail.send_message)(message)
+
+
+def pooled(messages: int, pool_size: int) -> None:
+    async def send():
+        pool = SMTPPool(local_config(), pool_size, max_messages_per_connection=1000)
+        emails = [
+            build_email([f"user{i}@example.com"], "Verify", "<p>hi</p>")
+            for i in range(messages)
+        ]
+        failures = await pool.send(emails)
+        await pool.close()
+        assert not failures, failures
+
+    asyncio.run(send())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    handler = CountingHandler(args.handshake_ms / 1000)
+    controller = Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+    try:
+        for name, send in (
+            ("per-message", lambda: per_message(args.messages)),
+            ("pooled", lambda: pooled(args.messages, args.pool_size)),
+        ):
+            received = handler.received
+            started = time.perf_counter()
+            send()
+            elapsed = time.perf_counter() - started
+            assert handler.received - received == args.messages
+            print(f"{name:12} {args.messages / elapsed:8.1f} messages/s")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
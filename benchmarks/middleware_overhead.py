@@ -0,0 +1,118 @@
+"""Per-request cost of the access log middleware.
+
+Sends requests to a /ping app in process (httpx ASGITransport) with no
+middleware, then with the app's middleware stack using the previous rich
+console logging and the JSON access log at full and sampled rates (json@0
+is the stack without any log writes). Both loggers write to /dev/null; rich
+is forced to render as it does for a terminal. Run with the app's
+environment configured (.env):
+
+    python -m benchmarks.middleware_overhead --requests 5000
+"""
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from rich.console import Console
+from src.access_log import start_access_log, stop_access_log
+from src.config import Config
+from src.middleware import register_middleware
+import argparse
+import asyncio
+import httpx
+import os
+import time
+
+
+def bare_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def rich_app(devnull) -> FastAPI:
+    app = bare_app()
+    console = Console(file=devnull, force_terminal=True)
+
+    # the middleware before the JSON access log
+    @app.middleware("http")
+    async def custom_logging(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        processing_time = time.time() - start_time
+        message = f"{request.client.host}:{request.client.port} - {request.method} - \
+        {request.url.path} - {response.status_code} - completed after {processing_time}s"
+        console.print(f"[bold white]{message}[/bold white]")
+        return response
+
+    # the rest of register_middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        allow_credentials=False,
+    )
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["localhost", "127.0.0.1"])
+
+    return app
+
+
+def json_app() -> FastAPI:
+    app = bare_app()
+    register_middleware(app)
+    return app
+
+
+async def per_request(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://localhost"
+    ) as client:
+        for _ in range(100):
+            await client.get("/ping")
+
+        started = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/ping")
+        return (time.perf_counter() - started) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    start_access_log(devnull)
+    try:
+        baseline = asyncio.run(per_request(bare_app(), args.requests))
+        results = [("none", baseline)]
+        results.append(
+            ("rich", asyncio.run(per_request(rich_app(devnull), args.requests)))
+        )
+
+        for name, rate in (
+            ("json", 1.0),
+            (f"json@{args.sample_rate:g}", args.sample_rate),
+            ("json@0", 0.0),
+        ):
+            Config.ACCESS_LOG_SAMPLE_RATE = rate
+            results.append((name, asyncio.run(per_request(json_app(), args.requests))))
+    finally:
+        stop_access_log()
+        devnull.close()
+
+    for name, seconds in results:
+        print(
+            f"{name:10} {seconds * 1_000_000:8.1f}us per request "
+            f"({(seconds - baseline) * 1_000_000:+7.1f}us middleware)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""add book search vector
+
+Adding a STORED generated column rewrites the whole books table under an
+ACCESS EXCLUSIVE lock, so reads and writes on books wait for it; run it in a
+maintenance window on large catalogs.
+
+Revision ID: 4d8e6b2f0a95
+Revises: 9a4f2d7c1b3e
+Create Date: 2026-01-19 16:04:12.551730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d8e6b2f0a95'
+down_revision: Union[str, Sequence[str], None] = '9a4f2d7c1b3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # a stored generated column is filled for every existing row when it is
+    # added and kept current by Postgres on insert/update
+    op.add_column('books', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(publisher, '')), 'C')",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_search_vector',
+            'books',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_books_search_vector',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column('books', 'search_vector')
@@ -0,0 +1,56 @@
+"""add book pagination indexes
+
+Revision ID: 9a4f2d7c1b3e
+Revises: 6e75c3b30301
+Create Date: 2026-01-12 10:21:44.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f2d7c1b3e'
+down_revision: Union[str, Sequence[str], None] = '6e75c3b30301'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # built concurrently so the books table stays writable while indexing
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_created_at_uid',
+            'books',
+            ['created_at', 'uid'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_books_user_uid_created_at_uid',
+            'books',
+            ['user_uid', 'created_at', 'uid'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_books_user_uid_created_at_uid',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_books_created_at_uid',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,42 @@
+"""add email outbox
+
+Revision ID: a6d4f2b8c0e3
+Revises: f3b9d1a7c4e2
+Create Date: 2026-02-23 11:37:15.284630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d4f2b8c0e3'
+down_revision: Union[str, Sequence[str], None] = 'f3b9d1a7c4e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'email_outbox',
+        sa.Column('uid', postgresql.UUID(), nullable=False),
+        sa.Column('recipients', postgresql.ARRAY(postgresql.VARCHAR()), nullable=False),
+        sa.Column('subject', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('body', postgresql.TEXT(), nullable=False),
+        sa.Column('created_at', postgresql.TIMESTAMP(), nullable=True),
+        sa.PrimaryKeyConstraint('uid'),
+    )
+    op.create_index(
+        'ix_email_outbox_created_at', 'email_outbox', ['created_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_email_outbox_created_at', table_name='email_outbox')
+    op.drop_table('email_outbox')
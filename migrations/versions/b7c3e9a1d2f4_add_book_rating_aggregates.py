@@ -0,0 +1,48 @@
+"""add book rating aggregates
+
+Revision ID: b7c3e9a1d2f4
+Revises: 4d8e6b2f0a95
+Create Date: 2026-02-02 11:47:05.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c3e9a1d2f4'
+down_revision: Union[str, Sequence[str], None] = '4d8e6b2f0a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('rating_sum', sa.INTEGER(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_count', sa.INTEGER(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('average_rating', postgresql.DOUBLE_PRECISION(), nullable=True))
+    op.execute(
+        """
+        UPDATE books
+        SET rating_sum = ratings.rating_sum,
+            rating_count = ratings.rating_count,
+            average_rating = ratings.rating_sum::double precision / ratings.rating_count
+        FROM (
+            SELECT book_uid, sum(rating) AS rating_sum, count(*) AS rating_count
+            FROM reviews
+            GROUP BY book_uid
+        ) AS ratings
+        WHERE books.uid = ratings.book_uid
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'average_rating')
+    op.drop_column('books', 'rating_count')
+    op.drop_column('books', 'rating_sum')
@@ -0,0 +1,44 @@
+"""add email outbox templates
+
+Revision ID: c1e7a3d5f9b2
+Revises: a6d4f2b8c0e3
+Create Date: 2026-03-02 16:48:09.117452
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1e7a3d5f9b2'
+down_revision: Union[str, Sequence[str], None] = 'a6d4f2b8c0e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'email_outbox',
+        sa.Column('template', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column(
+        'email_outbox', sa.Column('context', postgresql.JSONB(), nullable=True)
+    )
+    op.alter_column('email_outbox', 'subject', nullable=True)
+    op.alter_column('email_outbox', 'body', nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # templated emails cannot be expressed without these columns; run
+    # `python -m src.cli relay-outbox --once` before downgrading
+    op.execute('DELETE FROM email_outbox WHERE template IS NOT NULL')
+    op.alter_column('email_outbox', 'body', nullable=False)
+    op.alter_column('email_outbox', 'subject', nullable=False)
+    op.drop_column('email_outbox', 'context')
+    op.drop_column('email_outbox', 'template')
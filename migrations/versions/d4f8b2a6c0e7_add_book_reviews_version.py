@@ -0,0 +1,30 @@
+"""add book reviews version
+
+Revision ID: d4f8b2a6c0e7
+Revises: c1e7a3d5f9b2
+Create Date: 2026-03-09 10:14:37.520318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f8b2a6c0e7'
+down_revision: Union[str, Sequence[str], None] = 'c1e7a3d5f9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('reviews_version', sa.INTEGER(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'reviews_version')
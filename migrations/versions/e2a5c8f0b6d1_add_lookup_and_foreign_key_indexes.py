@@ -0,0 +1,56 @@
+"""add lookup and foreign key indexes
+
+Revision ID: e2a5c8f0b6d1
+Revises: b7c3e9a1d2f4
+Create Date: 2026-02-09 09:12:37.460821
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a5c8f0b6d1'
+down_revision: Union[str, Sequence[str], None] = 'b7c3e9a1d2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# books.user_uid and books.created_at are already covered as the leading
+# columns of ix_books_user_uid_created_at_uid and ix_books_created_at_uid
+INDEXES = [
+    ('ix_reviews_book_uid', 'reviews', ['book_uid'], False),
+    ('ix_reviews_user_uid', 'reviews', ['user_uid'], False),
+    ('ix_users_email', 'users', ['email'], True),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block. If the unique index
+    # fails because of duplicate emails it is left INVALID; drop it, dedupe
+    # users and re-run the migration.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
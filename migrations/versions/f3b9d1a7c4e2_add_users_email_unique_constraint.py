@@ -0,0 +1,53 @@
+"""add users email unique constraint
+
+Revision ID: f3b9d1a7c4e2
+Revises: e2a5c8f0b6d1
+Create Date: 2026-02-16 14:03:51.902117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d1a7c4e2'
+down_revision: Union[str, Sequence[str], None] = 'e2a5c8f0b6d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_users_email already enforces uniqueness; promoting it to a constraint
+    # (which renames the index) avoids a second build and a table scan
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_email',
+            'users',
+            ['email'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+    op.execute(
+        'ALTER TABLE users ADD CONSTRAINT uq_users_email UNIQUE USING INDEX ix_users_email'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_users_email', 'users', type_='unique')
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_users_email',
+            'users',
+            ['email'],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
@@ -1,13 +1,17 @@
-from fastapi import FastAPI, status
+from fastapi import FastAPI, status, Depends
 from fastapi.responses import JSONResponse
 from src.books.routes import book_routes
 from src.auth.routes import auth_router
 from src.reviews.routes import review_router
 from contextlib import asynccontextmanager
-from src.db.main import init_db
+from src.db.main import dispose_engines
+from src.access_log import start_access_log, stop_access_log
+from src.db.redis import init_redis, close_redis, suppressed_email_count
 from rich.console import Console
 from src.errors import register_all_handlers
 from src.middleware import register_middleware
+from src.auth.dependencies import RoleChecker
+from src import metrics
 
 console = Console()
 
@@ -15,8 +19,12 @@ console = Console()
 @asynccontextmanager
 async def life_span(app: FastAPI):
     console.print("[bold white]server is starting ...[/bold white]")
-    await init_db()
+    start_access_log()
+    await init_redis()
     yield
+    await close_redis()
+    await dispose_engines()
+    stop_access_log()
     console.print("[bold white]server has been stopped[/bold white]")
 
 
@@ -27,7 +35,8 @@ app = FastAPI(
     version=version,
     contact={
         "email": "mueed9972@gmail.com"
-    }
+    },
+    lifespan=life_span,
 )
 
 register_all_handlers(app)
@@ -37,3 +46,11 @@ register_middleware(app)
 app.include_router(book_routes, prefix=f"/api/{version}/books", tags=["books"])
 app.include_router(auth_router, prefix=f"/api/{version}/users", tags=["users"])
 app.include_router(review_router, prefix=f"/api/{version}/reviews", tags=["reviews"])
+
+
+@app.get(f"/api/{version}/metrics", dependencies=[Depends(RoleChecker(["admin"]))])
+async def get_metrics():
+    snapshot = metrics.snapshot()
+    # counted by the celery workers, which keep their own in-process metrics
+    snapshot["counters"]["mail.suppressed"] = await suppressed_email_count()
+    return snapshot
@@ -0,0 +1,85 @@
+"""JSON access log written off the event loop.
+
+The middleware only puts a record on a bounded queue; a QueueListener thread
+formats it and writes to stdout, so a slow terminal or pipe cannot stall
+requests. When the queue is full, records are dropped and counted.
+"""
+from logging.handlers import QueueHandler, QueueListener
+from src.config import Config
+from src import metrics
+import json
+import logging
+import queue
+import random
+import sys
+
+access_logger = logging.getLogger("bookly.access")
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+
+listener: QueueListener | None = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({"ts": round(record.created, 3), **record.access})
+
+
+class DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr("access_log.dropped")
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the formatting happens on the listener thread
+        return record
+
+
+def start_access_log(stream=None) -> None:
+    global listener
+
+    if listener is not None:
+        return
+
+    records = queue.Queue(maxsize=Config.ACCESS_LOG_QUEUE_SIZE)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JSONFormatter())
+
+    access_logger.addHandler(DroppingQueueHandler(records))
+    listener = QueueListener(records, handler)
+    listener.start()
+
+
+def stop_access_log() -> None:
+    """Detach the queue and write out what is left on it."""
+    global listener
+
+    if listener is None:
+        return
+
+    for handler in list(access_logger.handlers):
+        access_logger.removeHandler(handler)
+    listener.stop()
+    listener = None
+
+
+def log_request(
+    client: str | None, method: str, path: str, status: int, seconds: float
+) -> None:
+    if status < 300 and random.random() >= Config.ACCESS_LOG_SAMPLE_RATE:
+        return
+
+    access_logger.info(
+        "access",
+        extra={
+            "access": {
+                "client": client,
+                "method": method,
+                "path": path,
+                "status": status,
+                "duration_ms": round(seconds * 1000, 3),
+            }
+        },
+    )
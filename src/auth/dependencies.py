@@ -1,13 +1,14 @@
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from src.auth.utils import decode_token
+from src.auth.utils import decode_token_cached
 from fastapi.exceptions import HTTPException
 from fastapi import status, Request, Depends
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.main import get_session
-from src.db.redis import token_in_blocklist
+from src.db.main import get_session, get_read_session
+from src.db.redis import token_in_blocklist, get_user_state
 from src.auth.service import UserService
-from typing import List
-from src.db.models import User
+from src.config import Config
+from typing import List, Optional
+import time
 from src.errors import (
     InvalidToken,
     ReevokedToken,
@@ -15,9 +16,14 @@ from src.errors import (
     RefreshTokenRequired,
     InsufficientPermission,
     AccountNotVerified,
+    UserNotFound,
 )
 
 user_service = UserService()
+USER_STATE_CACHE_SIZE = 10_000
+
+# user_uid -> (expires_at, state marker or None)
+user_state_cache: dict[str, tuple[float, Optional[dict]]] = {}
 
 
 class TokenBearer(HTTPBearer):
@@ -26,23 +32,23 @@ class TokenBearer(HTTPBearer):
         super().__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request) -> HTTPAuthorizationCredentials | None:
-        creds = await super().__call__(request)
-        token = creds.credentials
-        token_data = decode_token(token)
+        # several dependencies of one route may each run a bearer; verify once
+        token_data = getattr(request.state, "token_data", None)
 
-        if not self.token_valid(token):
-            raise InvalidToken()
+        if token_data is None:
+            creds = await super().__call__(request)
+            token_data = decode_token_cached(creds.credentials)
 
-        if await token_in_blocklist(token_data["jti"]):
-            raise ReevokedToken()
+            if token_data is None:
+                raise InvalidToken()
 
-        self.verify_token_data(token_data)
-        return token_data
+            if await token_in_blocklist(token_data["jti"]):
+                raise ReevokedToken()
 
-    def token_valid(self, token: str) -> bool:
-        token_data = decode_token(token)
+            request.state.token_data = token_data
 
-        return True if token_data is not None else False
+        self.verify_token_data(token_data)
+        return token_data
 
 
 class AccessTokenBearer(TokenBearer):
@@ -67,13 +73,68 @@ async def get_current_user(
     return user
 
 
+async def get_current_user_readonly(
+    token_details: dict = Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """get_current_user for routes that only read, possibly from a replica."""
+    user_email = token_details["user"]["email"]
+    return await user_service.get_user_by_email(user_email, session)
+
+
+async def get_cached_user_state(user_uid: str) -> Optional[dict]:
+    now = time.monotonic()
+    cached = user_state_cache.get(user_uid)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    state = await get_user_state(user_uid)
+    if len(user_state_cache) >= USER_STATE_CACHE_SIZE:
+        user_state_cache.clear()
+    user_state_cache[user_uid] = (now + Config.USER_STATE_CACHE_TTL, state)
+    return state
+
+
+def claims_from_token(token_details: dict, state: Optional[dict]) -> Optional[dict]:
+    """Role and verified flag as signed into the token, unless the user's role
+    or verification changed after the token was issued.
+
+    Returns None for tokens minted before these claims existed.
+    """
+    user_data = token_details["user"]
+    if "user_role" not in user_data or "is_verified" not in user_data:
+        return None
+
+    if state is not None and state["changed_at"] >= token_details.get("iat", 0):
+        return {"role": state["role"], "is_verified": state["is_verified"]}
+
+    return {"role": user_data["user_role"], "is_verified": user_data["is_verified"]}
+
+
+async def get_user_claims(
+    token_details: dict = Depends(AccessTokenBearer()),
+    session: AsyncSession = Depends(get_session),
+) -> dict:
+    if Config.AUTHZ_MODE == "claims":
+        state = await get_cached_user_state(token_details["user"]["user_uid"])
+        claims = claims_from_token(token_details, state)
+        if claims is not None:
+            return claims
+
+    user = await user_service.get_user_by_email(token_details["user"]["email"], session)
+    if user is None:
+        raise UserNotFound()
+
+    return {"role": user.role, "is_verified": user.is_verified}
+
+
 class RoleChecker:
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
 
-    def __call__(self, current_user: User = Depends(get_current_user)):
-        if current_user.is_verified == False:
+    def __call__(self, claims: dict = Depends(get_user_claims)):
+        if claims["is_verified"] == False:
             raise AccountNotVerified()
-        if current_user.role in self.allowed_roles:
+        if claims["role"] in self.allowed_roles:
             return True
         raise InsufficientPermission()
@@ -0,0 +1,72 @@
+from fastapi import Request
+from redis.exceptions import RedisError
+from src.config import Config
+from src.db.redis import sliding_window_hit
+from src.errors import TooManyRequests
+from src import metrics
+import ipaddress
+import logging
+import math
+
+trusted_proxies = [
+    ipaddress.ip_network(proxy.strip())
+    for proxy in Config.TRUSTED_PROXIES.split(",")
+    if proxy.strip()
+]
+
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+
+def client_ip(request: Request) -> str:
+    """The address of the client, read from X-Forwarded-For when the request
+    came through one of TRUSTED_PROXIES.
+
+    Walks the header from the right and returns the first hop that is not a
+    trusted proxy, so clients cannot pick their bucket by sending the header
+    themselves.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(host):
+        return host
+
+    forwarded = request.headers.get("x-forwarded-for", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        if not is_trusted_proxy(hop):
+            return hop
+        host = hop
+
+    return host
+
+
+async def enforce_auth_rate_limit(
+    scope: str, request: Request, email: str | None = None
+) -> None:
+    """Count an attempt against the client IP and, when given, the email.
+
+    Raises TooManyRequests once either is over its limit for
+    AUTH_RATE_LIMIT_WINDOW. Fails open: if Redis is unreachable the attempt
+    is allowed and the error logged, so a Redis outage does not lock every
+    user out.
+    """
+    limits = [(f"ip:{client_ip(request)}", Config.AUTH_RATE_LIMIT_PER_IP)]
+    if email:
+        limits.append((f"email:{email.lower()}", Config.AUTH_RATE_LIMIT_PER_EMAIL))
+
+    for subject, limit in limits:
+        try:
+            retry_after = await sliding_window_hit(
+                f"ratelimit:{scope}:{subject}", limit, Config.AUTH_RATE_LIMIT_WINDOW
+            )
+        except RedisError:
+            logging.exception("auth rate limiter unavailable")
+            return
+
+        if retry_after:
+            metrics.incr(f"rate_limit.{scope}.rejected")
+            raise TooManyRequests(retry_after=math.ceil(retry_after))
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status, BackgroundTasks
+from fastapi import APIRouter, Depends, status, BackgroundTasks, Request
 from src.auth.schemas import (
     UserCreateModel,
     UserModel,
@@ -9,6 +9,7 @@ from src.auth.schemas import (
     PasswordResetConfirmModel,
 )
 from src.auth.service import UserService
+from src.auth.ratelimit import enforce_auth_rate_limit
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from src.db.main import get_session
 from fastapi.exceptions import HTTPException
@@ -18,21 +19,20 @@ from fastapi.responses import JSONResponse
 from src.config import Config
 from src.auth.utils import (
     create_access_token,
-    verify_password,
-    generate_passwd_hash,
+    verify_password_async,
+    generate_passwd_hash_async,
     create_url_safe_token,
     decode_url_safe_token,
 )
 from src.auth.dependencies import (
     RefreshTokenBearer,
     AccessTokenBearer,
-    get_current_user,
+    get_current_user_readonly,
     RoleChecker,
 )
-from src.db.redis import add_jti_to_blocklist
-from src.mail import create_message, mail
+from src.db.redis import add_jti_to_blocklist, get_user_state
+from src.outbox import outbox_email, queue_emails
 from src.errors import UserAlreadyExist, InvalidCredentials, InvalidToken, UserNotFound
-from src.celery_tasks import send_email
 
 console = Console()
 
@@ -43,13 +43,10 @@ REFRESH_TOKEN_EXPIRY = 2
 
 
 @auth_router.post("/send_mail")
-async def send_mail(emails: EmailModel):
+async def send_mail(emails: EmailModel, session: AsyncSession = Depends(get_session)):
     emails = emails.addresses
 
-    html = "<h1>Welcome to the App</h1>"
-    subject = "Welcome Message"
-
-    send_email.delay(emails, subject, html)
+    await queue_emails([outbox_email(emails, "welcome", {})], session)
 
     return {"message": f"mail has been sent to {emails}"}
 
@@ -62,26 +59,21 @@ async def send_mail(emails: EmailModel):
 async def create_user_account(
     user_data: UserCreateModel,
     bg_tasks: BackgroundTasks,
+    request: Request,
     session: AsyncSession = Depends(get_session),
 ):
-    user = await user_service.user_exists(user_data.email, session)
-    if user:
-        raise UserAlreadyExist()
-
-    new_user = await user_service.create_user(user_data, session)
+    await enforce_auth_rate_limit("signup", request, user_data.email)
 
     token = create_url_safe_token({"email": user_data.email})
     link = f"http://{Config.DOMAIN}/api/v1/users/verify/{token}"
 
-    html_message = f"""
-        <h1>Verify your Email</h1>
-        <p>Please click this <a href="{link}">link</a> to verify your Email
-    """
-
-    emails = [user_data.email]
-    subject = "Email Verification"
-
-    send_email.delay(emails, subject, html_message)
+    new_user = await user_service.create_user(
+        user_data,
+        session,
+        emails=[outbox_email([user_data.email], "verify_email", {"link": link})],
+    )
+    if new_user is None:
+        raise UserAlreadyExist()
 
     return {
         "message": "Your Account has been created successfully, check your email to verify account",
@@ -95,12 +87,13 @@ async def verify_user_account(token: str, session: AsyncSession = Depends(get_se
     user_email = token_data.get("email")
 
     if user_email:
-        user = await user_service.get_user_by_email(user_email, session)
+        user = await user_service.update_user(
+            user_email, {"is_verified": True}, session
+        )
 
         if not user:
             raise UserNotFound()
 
-        await user_service.update_user(user, {"is_verified": True}, session)
         return JSONResponse(
             content={"message": "Account Verified Successfully"},
             status_code=status.HTTP_200_OK,
@@ -113,15 +106,19 @@ async def verify_user_account(token: str, session: AsyncSession = Depends(get_se
 
 @auth_router.post("/login")
 async def login_users(
-    login_data: UserLoginModel, session: AsyncSession = Depends(get_session)
+    login_data: UserLoginModel,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
 ):
     email = login_data.email
     password = login_data.password
 
+    await enforce_auth_rate_limit("login", request, email)
+
     user = await user_service.get_user_by_email(email, session)
 
     if user:
-        validate_password = verify_password(password, user.password)
+        validate_password = await verify_password_async(password, user.password)
 
         if validate_password:
             access_token = create_access_token(
@@ -129,11 +126,17 @@ async def login_users(
                     "email": user.email,
                     "user_uid": str(user.uid),
                     "user_role": user.role,
+                    "is_verified": user.is_verified,
                 }
             )
 
             refresh_token = create_access_token(
-                user_data={"email": user.email, "user_uid": str(user.uid)},
+                user_data={
+                    "email": user.email,
+                    "user_uid": str(user.uid),
+                    "user_role": user.role,
+                    "is_verified": user.is_verified,
+                },
                 refresh=True,
                 expiry=timedelta(days=REFRESH_TOKEN_EXPIRY),
             )
@@ -155,7 +158,17 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
     expiry_timestamp = token_details.get("exp")
 
     if datetime.fromtimestamp(expiry_timestamp) > datetime.now():
-        new_access_token = create_access_token(user_data=token_details["user"])
+        user_data = token_details["user"]
+        state = await get_user_state(user_data["user_uid"])
+        if state is not None:
+            # claims carried over from the refresh token may be out of date
+            user_data = {
+                **user_data,
+                "user_role": state["role"],
+                "is_verified": state["is_verified"],
+            }
+
+        new_access_token = create_access_token(user_data=user_data)
         return JSONResponse(content={"access_token": new_access_token})
 
     raise InvalidToken()
@@ -163,7 +176,7 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
 
 @auth_router.get("/me", response_model=UserBooksModel)
 async def get_current_user(
-    user=Depends(get_current_user), role: bool = Depends(role_checker)
+    user=Depends(get_current_user_readonly), role: bool = Depends(role_checker)
 ):
 
     return user
@@ -187,19 +200,17 @@ async def revooke_token(token_details: dict = Depends(AccessTokenBearer())):
 
 
 @auth_router.post("/password-reset-request")
-async def password_reset_request(email_data: PasswordResetRequestModel):
+async def password_reset_request(
+    email_data: PasswordResetRequestModel, session: AsyncSession = Depends(get_session)
+):
     token = create_url_safe_token({"email": email_data.email})
     link = f"http://{Config.DOMAIN}/api/v1/users/password-reset-confirm/{token}"
 
-    html_message = f"""
-        <h1>Verify your Email</h1>
-        <p>Please click this <a href="{link}">link</a> to Reset your password
-    """
-    message = create_message(
-        recipients=[email_data.email], subject="Reset your password", body=html_message
+    message = outbox_email(
+        recipients=[email_data.email], template="password_reset", context={"link": link}
     )
 
-    await mail.send_message(message)
+    await queue_emails([message], session)
 
     return JSONResponse(
         content={
@@ -213,6 +224,7 @@ async def password_reset_request(email_data: PasswordResetRequestModel):
 async def reset_account_password(
     token: str,
     passwords: PasswordResetConfirmModel,
+    request: Request,
     session: AsyncSession = Depends(get_session),
 ):
     if passwords.new_password != passwords.confirm_new_password:
@@ -223,13 +235,16 @@ async def reset_account_password(
     user_email = token_data.get("email")
 
     if user_email:
-        user = await user_service.get_user_by_email(user_email, session)
+        await enforce_auth_rate_limit("password_reset", request, user_email)
+
+        passwd_hash = await generate_passwd_hash_async(passwords.new_password)
+        user = await user_service.update_user(
+            user_email, {"password": passwd_hash}, session
+        )
 
         if not user:
             raise UserNotFound()
 
-        passwd_hash = generate_passwd_hash(passwords.new_password)
-        await user_service.update_user(user, {"password": passwd_hash}, session)
         return JSONResponse(
             content={"message": "Password updated Successfully"},
             status_code=status.HTTP_200_OK,
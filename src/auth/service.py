@@ -1,8 +1,12 @@
-from src.db.models import User
+from src.db.models import User, EmailOutbox
+from typing import Optional
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from sqlmodel import select
+from sqlalchemy import update
+import sqlalchemy.dialects.postgresql as pg
 from src.auth.schemas import UserCreateModel
-from src.auth.utils import generate_passwd_hash, verify_password
+from src.auth.utils import generate_passwd_hash_async
+from src.db.redis import set_user_state
 from rich.console import Console
 
 console = Console()
@@ -26,25 +30,62 @@ class UserService:
             return True 
         return False
     
-    async def create_user(self, user_data: UserCreateModel, session: AsyncSession):
+    async def create_user(
+        self,
+        user_data: UserCreateModel,
+        session: AsyncSession,
+        emails: Optional[list[EmailOutbox]] = None,
+    ):
+        """Insert the user unless the email is taken, in which case return None.
+
+        `emails` are queued in the outbox in the same transaction as the user.
+        """
         user_data_dict = user_data.model_dump()
-        new_user = User(**user_data_dict)
-        passwd = user_data_dict['password']
-        new_user.password = generate_passwd_hash(passwd)
-        new_user.role = "user"
-        
+        user_data_dict["password"] = await generate_passwd_hash_async(
+            user_data_dict["password"]
+        )
+
+        statement = (
+            pg.insert(User)
+            .values(**user_data_dict, role="user", is_verified=False)
+            .on_conflict_do_nothing(index_elements=["email"])
+            .returning(
+                User.uid,
+                User.username,
+                User.email,
+                User.first_name,
+                User.last_name,
+                User.role,
+                User.is_verified,
+                User.created_at,
+                User.updated_at,
+            )
+        )
 
-        session.add(new_user)
+        result = await session.execute(statement)
+        new_user = result.first()
+        if new_user is not None and emails:
+            session.add_all(emails)
         await session.commit()
 
-        return new_user
+        return dict(new_user._mapping) if new_user is not None else None
     
-    async def update_user(self, user: User, user_data: dict, session: AsyncSession):
-
-        for k, v in user_data.items():
-            setattr(user, k, v)
+    async def update_user(self, email: str, user_data: dict, session: AsyncSession):
+        statement = (
+            update(User)
+            .where(User.email == email)
+            .values(**user_data)
+            .returning(User.uid, User.email, User.role, User.is_verified)
+            .execution_options(synchronize_session=False)
+        )
 
+        result = await session.execute(statement)
+        user = result.first()
         await session.commit()
 
+        if user is not None and ("role" in user_data or "is_verified" in user_data):
+            # lets tokens issued before this change pick up the new claims
+            await set_user_state(user.uid, user.role, user.is_verified)
+
         return user
     
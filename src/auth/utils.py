@@ -1,7 +1,14 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from src.config import Config
+from src import metrics
+from src.errors import ServerOverloaded
 from itsdangerous import URLSafeTimedSerializer
+import asyncio
+import hashlib
+import time
 import jwt
 import uuid
 import logging
@@ -9,6 +16,13 @@ import logging
 passwd_context = CryptContext(schemes=["bcrypt"])
 ACCESS_TOKEN_EXPIRY = 3600
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop while bounding how many hashes run at once
+hash_executor = ThreadPoolExecutor(
+    max_workers=Config.PASSWORD_HASH_WORKERS, thread_name_prefix="passwd-hash"
+)
+hashes_in_flight = 0
+
 
 def generate_passwd_hash(password: str) -> str:
     hash = passwd_context.hash(password)
@@ -19,12 +33,43 @@ def verify_password(password: str, hash: str) -> bool:
     return passwd_context.verify(password, hash)
 
 
+def hash_queue_depth() -> int:
+    return max(0, hashes_in_flight - Config.PASSWORD_HASH_WORKERS)
+
+
+async def run_in_hash_pool(func, *args):
+    global hashes_in_flight
+
+    # shed work that would wait behind a full queue rather than let it pile up
+    if hash_queue_depth() >= Config.PASSWORD_HASH_MAX_QUEUE:
+        metrics.incr("password_hash.shed")
+        raise ServerOverloaded(retry_after=1)
+
+    hashes_in_flight += 1
+    metrics.set_gauge("password_hash.queue_depth", hash_queue_depth())
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, func, *args)
+    finally:
+        hashes_in_flight -= 1
+        metrics.set_gauge("password_hash.queue_depth", hash_queue_depth())
+
+
+async def generate_passwd_hash_async(password: str) -> str:
+    return await run_in_hash_pool(generate_passwd_hash, password)
+
+
+async def verify_password_async(password: str, hash: str) -> bool:
+    return await run_in_hash_pool(verify_password, password, hash)
+
+
 def create_access_token(
     user_data: dict, expiry: timedelta = None, refresh: bool = False
 ):
     payload = {}
 
     payload["user"] = user_data
+    payload["iat"] = datetime.utcnow()
 
     if expiry is not None:
         payload["exp"] = datetime.utcnow() + expiry
@@ -52,6 +97,33 @@ def decode_token(token: str):
         logging.exception(e)
         return None
 
+
+# sha256(token) -> verified payload, least recently used first
+verified_tokens: OrderedDict[str, dict] = OrderedDict()
+
+
+def decode_token_cached(token: str):
+    """decode_token, remembering verified payloads until their `exp`.
+
+    The returned payload is shared between callers and must not be modified.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    token_data = verified_tokens.get(key)
+
+    if token_data is not None:
+        if token_data["exp"] > time.time():
+            verified_tokens.move_to_end(key)
+            return token_data
+        del verified_tokens[key]
+
+    token_data = decode_token(token)
+    if token_data is not None and "exp" in token_data:
+        verified_tokens[key] = token_data
+        if len(verified_tokens) > Config.TOKEN_CACHE_SIZE:
+            verified_tokens.popitem(last=False)
+
+    return token_data
+
 serializer = URLSafeTimedSerializer(
         secret_key=Config.JWT_SECRET, salt="email-verification"
     )
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.exceptions import HTTPException
-from src.books.schemas import Books, UpdateBookModel, CreateBookModel, BookDetailModel
-from src.db.main import get_session
+from src.books.schemas import (
+    Books,
+    UpdateBookModel,
+    CreateBookModel,
+    BookDetailModel,
+    BookPageModel,
+    BookSearchPageModel,
+    BulkImportResultModel,
+)
+from src.db.main import get_session, get_read_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.books.service import BookService
-from typing import List
+from src.books.utils import make_etag, etag_matches, iter_lines
+from src.export import stream_rows, EXPORT_MEDIA_TYPES
+from typing import Literal, Optional
+from datetime import datetime
 from src.auth.dependencies import AccessTokenBearer, RoleChecker
 from src.errors import BookNotFound
 
@@ -12,26 +24,81 @@ book_routes = APIRouter()
 book_service = BookService()
 access_token_bearer = AccessTokenBearer()
 role_checker = Depends(RoleChecker(["user", "admin"]))
+admin_checker = Depends(RoleChecker(["admin"]))
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_SEARCH_OFFSET = 1000
+
+
+def page_response(page: dict, request: Request, response: Response):
+    etag = make_etag(
+        page["next_cursor"],
+        *(
+            (book.uid, book.updated_at, book.reviews_version)
+            for book in page["books"]
+        ),
+    )
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+
+    response.headers["ETag"] = etag
+    return page
 
 
-@book_routes.get("/", response_model=List[Books], dependencies=[role_checker])
+@book_routes.get("/", response_model=BookPageModel, dependencies=[role_checker])
 async def get_all_books(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer),
 ):
-    books = await book_service.get_all_books(session)
-    return books
+    books = await book_service.get_all_books(session, limit, cursor)
+    return page_response(books, request, response)
 
 
 @book_routes.get(
-    "/user/{user_uid}", response_model=List[Books], dependencies=[role_checker]
+    "/user/{user_uid}", response_model=BookPageModel, dependencies=[role_checker]
 )
 async def get_user_books_submission(
     user_uid: str,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer),
 ):
-    books = await book_service.get_user_books(user_uid, session)
+    books = await book_service.get_user_books(user_uid, session, limit, cursor)
+    return page_response(books, request, response)
+
+
+@book_routes.get("/export", dependencies=[admin_checker])
+async def export_books(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+    token_details: dict = Depends(access_token_bearer),
+):
+    statement = book_service.get_export_statement(since)
+    return StreamingResponse(
+        stream_rows(statement, format), media_type=EXPORT_MEDIA_TYPES[format]
+    )
+
+
+@book_routes.get(
+    "/search", response_model=BookSearchPageModel, dependencies=[role_checker]
+)
+async def search_books(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    books = await book_service.search_books(q, session, limit, offset)
     return books
 
 
@@ -40,11 +107,26 @@ async def get_user_books_submission(
 )
 async def get_book_by_uid(
     book_uid: str,
+    request: Request,
+    response: Response,
     session: AsyncSession = Depends(get_session),
     token_details: dict = Depends(access_token_bearer),
 ):
-    book = await book_service.get_book_by_uid(book_uid, session)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        version = await book_service.get_book_version(book_uid, session)
+        if version is None:
+            raise BookNotFound()
+
+        etag = make_etag(*version)
+        if etag_matches(if_none_match, etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+            )
+
+    book = await book_service.get_book_detail(book_uid, session)
     if book is not None:
+        response.headers["ETag"] = make_etag(book.updated_at, book.reviews_version)
         return book
     raise BookNotFound()
 
@@ -65,6 +147,26 @@ async def craete_book(
     return new_book
 
 
+@book_routes.post(
+    "/bulk-import",
+    response_model=BulkImportResultModel,
+    dependencies=[role_checker],
+)
+async def bulk_import_books(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+):
+    user_uid = token_details.get("user")["user_uid"]
+    content_type = request.headers.get("content-type", "")
+    file_format = "csv" if content_type.startswith("text/csv") else "ndjson"
+
+    result = await book_service.bulk_import_books(
+        iter_lines(request.stream()), file_format, user_uid, session
+    )
+    return result
+
+
 @book_routes.delete(
     "/{book_uid}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[role_checker]
 )
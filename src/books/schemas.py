@@ -1,10 +1,22 @@
-from pydantic import BaseModel
+from pydantic import AfterValidator, BaseModel, Field
 from datetime import datetime
-from typing import List, Optional
+from typing import Annotated, List, Optional
 from src.reviews.schemas import ReviewModel
 import uuid
 
 
+def reject_nul(value: str) -> str:
+    # Postgres text cannot store NUL characters
+    if "\x00" in value:
+        raise ValueError("must not contain NUL characters")
+    return value
+
+
+# what the books columns accept, so bad rows fail validation, not the insert
+Int4 = Annotated[int, Field(ge=-(2**31), le=2**31 - 1)]
+Text = Annotated[str, AfterValidator(reject_nul)]
+
+
 class Books(BaseModel):
     uid: uuid.UUID
     title: str
@@ -14,6 +26,9 @@ class Books(BaseModel):
     language: str
     pages: int
     user_uid: uuid.UUID
+    rating_count: int = 0
+    average_rating: Optional[float] = None
+    reviews_version: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -25,19 +40,42 @@ class BookDetailModel(Books):
     reviews: List[ReviewModel] = []
 
 
+class BookPageModel(BaseModel):
+    books: List[Books]
+    next_cursor: Optional[str] = None
+
+
+class BookSearchPageModel(BaseModel):
+    books: List[Books]
+    next_offset: Optional[int] = None
+
+
 class CreateBookModel(BaseModel):
-    title: str
-    author: str
-    publisher: str
-    published_year: int
-    language: str
-    pages: int
+    title: Text
+    author: Text
+    publisher: Text
+    published_year: Int4
+    language: Text
+    pages: Int4
 
 
 class UpdateBookModel(BaseModel):
-    title: str
-    author: str
-    publisher: str
-    published_year: int
-    language: str
-    pages: int
+    title: Text
+    author: Text
+    publisher: Text
+    published_year: Int4
+    language: Text
+    pages: Int4
+
+
+class BulkImportErrorModel(BaseModel):
+    line: int
+    detail: str
+
+
+class BulkImportResultModel(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportErrorModel] = []
+    elapsed_seconds: float
+    rows_per_second: float
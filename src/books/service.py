@@ -1,30 +1,142 @@
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from src.db.models import Book
-from src.books.schemas import CreateBookModel, UpdateBookModel
+from src.db.models import Book, Review
+from src.books.schemas import (
+    Books,
+    BookDetailModel,
+    CreateBookModel,
+    UpdateBookModel,
+)
+from src.books.utils import encode_cursor, decode_cursor
+from src.db.redis import get_cached_book, cache_book, invalidate_cached_book
+from src import metrics
 from sqlmodel import select, desc
+from sqlalchemy import tuple_, func, cast, insert, update, delete
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import selectinload
+from typing import AsyncIterator, Optional
+from datetime import datetime
+from pydantic import ValidationError
+import csv
+import time
 import uuid
 
+# list endpoints only need the columns of `Books`; selecting them directly
+# skips ORM hydration and the selectin load of `Book.reviews`
+BOOK_LIST_COLUMNS = tuple(getattr(Book, field) for field in Books.model_fields)
+BULK_IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_IMPORT_ERRORS = 100
+
 
 class BookService:
-    async def get_all_books(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+    async def _get_books_page(
+        self, statement, limit: int, cursor: Optional[str], session: AsyncSession
+    ):
+        if cursor is not None:
+            created_at, uid = decode_cursor(cursor)
+            statement = statement.where(
+                tuple_(Book.created_at, Book.uid) < tuple_(created_at, uid)
+            )
+
+        statement = statement.order_by(desc(Book.created_at), desc(Book.uid)).limit(
+            limit + 1
+        )
 
         result = await session.execute(statement)
+        books = result.all()
+
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            next_cursor = encode_cursor(books[-1].created_at, books[-1].uid)
+
+        return {"books": books, "next_cursor": next_cursor}
+
+    async def get_all_books(
+        self, session: AsyncSession, limit: int = 20, cursor: Optional[str] = None
+    ):
+        statement = select(*BOOK_LIST_COLUMNS)
+
+        return await self._get_books_page(statement, limit, cursor, session)
+
+    async def get_user_books(
+        self,
+        user_uid: str,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ):
+        statement = select(*BOOK_LIST_COLUMNS).where(Book.user_uid == user_uid)
+
+        return await self._get_books_page(statement, limit, cursor, session)
+
+    async def search_books(
+        self, query: str, session: AsyncSession, limit: int = 20, offset: int = 0
+    ):
+        ts_query = func.websearch_to_tsquery(cast("english", REGCONFIG), query)
+        rank = func.ts_rank_cd(Book.search_vector, ts_query)
+
+        statement = (
+            select(*BOOK_LIST_COLUMNS)
+            .where(Book.search_vector.op("@@")(ts_query))
+            .order_by(desc(rank), Book.uid)
+            .offset(offset)
+            .limit(limit + 1)
+        )
 
-        return result.scalars().all()
-    
-    async def get_user_books(self, user_uid: str, session: AsyncSession):
-        statement = select(Book).where(Book.user_uid == user_uid)
         result = await session.execute(statement)
-        return result.scalars().all()
+        books = result.all()
+
+        next_offset = None
+        if len(books) > limit:
+            books = books[:limit]
+            next_offset = offset + limit
+
+        return {"books": books, "next_offset": next_offset}
+
+    def get_export_statement(self, since: Optional[datetime] = None):
+        statement = select(*BOOK_LIST_COLUMNS)
+        if since is not None:
+            statement = statement.where(Book.updated_at >= since)
+        return statement
 
     async def get_book_by_uid(self, book_uid: uuid, session: AsyncSession):
-        statement = select(Book).where(Book.uid == book_uid)
+        statement = (
+            select(Book).where(Book.uid == book_uid).options(selectinload(Book.reviews))
+        )
 
         result = await session.execute(statement)
         book = result.scalars().first()
         return book if book is not None else None
 
+    async def get_book_version(self, book_uid: str, session: AsyncSession):
+        cached_book = await get_cached_book(book_uid)
+        if cached_book is not None:
+            book = BookDetailModel.model_validate_json(cached_book)
+            return book.updated_at, book.reviews_version
+
+        statement = select(Book.updated_at, Book.reviews_version).where(
+            Book.uid == book_uid
+        )
+
+        result = await session.execute(statement)
+        version = result.first()
+        return tuple(version) if version is not None else None
+
+    async def get_book_detail(self, book_uid: str, session: AsyncSession):
+        cached_book = await get_cached_book(book_uid)
+        if cached_book is not None:
+            metrics.incr("book_cache.hit")
+            return BookDetailModel.model_validate_json(cached_book)
+
+        metrics.incr("book_cache.miss")
+        book = await self.get_book_by_uid(book_uid, session)
+        if book is None:
+            return None
+
+        book_detail = BookDetailModel.model_validate(book)
+        await cache_book(book_uid, book_detail.model_dump_json())
+        return book_detail
+
     async def create_book(
         self, book_data: CreateBookModel, user_uid: str, session: AsyncSession
     ):
@@ -38,24 +150,119 @@ class BookService:
     async def update_book(
         self, book_uid: uuid, updated_data: UpdateBookModel, session: AsyncSession
     ):
-        book_to_update = await self.get_book_by_uid(book_uid, session)
-        if book_to_update is not None:
-            updated_book_data = updated_data.model_dump()
+        statement = (
+            update(Book)
+            .where(Book.uid == book_uid)
+            .values(**updated_data.model_dump())
+            .returning(*BOOK_LIST_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
 
-            for k, v in updated_book_data.items():
-                setattr(book_to_update, k, v)
-            await session.commit()
+        result = await session.execute(statement)
+        updated_book = result.first()
+        await session.commit()
 
-            return book_to_update
-        return None
+        if updated_book is not None:
+            await invalidate_cached_book(book_uid)
+        return updated_book
 
     async def delete_book(self, book_uid, session: AsyncSession):
-        book_to_delete = await self.get_book_by_uid(book_uid, session)
+        # detach the book's reviews in the same statement, as the ORM delete
+        # used to do, so the foreign key does not block the delete
+        orphaned_reviews = (
+            update(Review)
+            .where(Review.book_uid == book_uid)
+            .values(book_uid=None)
+            .cte("orphaned_reviews")
+        )
+        statement = (
+            delete(Book)
+            .where(Book.uid == book_uid)
+            .add_cte(orphaned_reviews)
+            .returning(Book.uid)
+            .execution_options(synchronize_session=False)
+        )
 
-        if book_to_delete is not None:
-            await session.delete(book_to_delete)
-            await session.commit()
+        result = await session.execute(statement)
+        deleted_uid = result.scalar()
+        await session.commit()
+
+        if deleted_uid is not None:
+            await invalidate_cached_book(book_uid)
             return {}
+        return None
 
-        else:
-            return None
+    async def bulk_import_books(
+        self,
+        lines: AsyncIterator[Optional[str]],
+        file_format: str,
+        user_uid: str,
+        session: AsyncSession,
+    ):
+        started = time.perf_counter()
+        inserted = failed = 0
+        errors = []
+        batch = []
+        header = None
+        line_number = 0
+
+        # batches keep memory flat; the import commits once, so a database
+        # error part way through leaves nothing behind to clean up or resume
+        async def flush():
+            nonlocal inserted
+            await session.execute(insert(Book), batch)
+            inserted += len(batch)
+            batch.clear()
+
+        def record_error(detail: str):
+            nonlocal failed
+            failed += 1
+            if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+                errors.append({"line": line_number, "detail": detail})
+
+        async for line in lines:
+            line_number += 1
+            if line is None:
+                record_error("line too long")
+                continue
+            if not line.strip():
+                continue
+
+            try:
+                if file_format == "csv":
+                    values = next(csv.reader([line]))
+                    if header is None:
+                        header = [column.strip() for column in values]
+                        continue
+                    row = dict(zip(header, values))
+                    book_data = CreateBookModel.model_validate(row)
+                else:
+                    book_data = CreateBookModel.model_validate_json(line)
+            except ValidationError as e:
+                record_error(
+                    "; ".join(
+                        f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}"
+                        for error in e.errors()
+                    )
+                )
+                continue
+            except csv.Error as e:
+                record_error(str(e))
+                continue
+
+            batch.append({**book_data.model_dump(), "user_uid": user_uid})
+            if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+                await flush()
+
+        if batch:
+            await flush()
+        await session.commit()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "inserted": inserted,
+            "failed": failed,
+            "errors": errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(inserted / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import base64
+import hashlib
+import json
+import uuid
+
+from src.errors import InvalidCursor
+
+
+def encode_cursor(created_at: datetime, uid: uuid.UUID) -> str:
+    payload = json.dumps([created_at.isoformat(), str(uid)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        created_at, uid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(uid)
+    except (ValueError, TypeError):
+        raise InvalidCursor()
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = 64 * 1024
+) -> AsyncIterator[Optional[str]]:
+    """Split a byte stream into decoded lines while holding at most one line.
+
+    Lines longer than `max_line_bytes` are dropped and reported as `None`.
+    """
+    buffer = b""
+    overflow = False
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+
+        for line in lines:
+            if overflow:
+                overflow = False
+                yield None
+            else:
+                yield line.decode("utf-8", errors="replace").rstrip("\r")
+
+        if len(buffer) > max_line_bytes:
+            buffer = b""
+            overflow = True
+
+    if overflow:
+        yield None
+    elif buffer:
+        yield buffer.decode("utf-8", errors="replace").rstrip("\r")
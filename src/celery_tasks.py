@@ -1,15 +1,272 @@
 from celery import Celery
-from src.mail import create_message, mail
-from asgiref.sync import async_to_sync
+from kombu import Queue
+from celery.signals import worker_process_init, worker_process_shutdown
+from email.message import EmailMessage
+from jinja2 import TemplateError
+from src.mail import (
+    REPLACEABLE_EMAIL_TEMPLATES,
+    build_email,
+    compile_email_templates,
+    mail_config,
+    render_email,
+    SMTPPool,
+)
 from src.config import Config
+from src.db.redis import (
+    claim_email_sends,
+    close_redis,
+    confirm_email_sends,
+    email_dedup_key,
+    record_suppressed_emails,
+    release_email_sends,
+)
+from src import metrics
+from redis.exceptions import RedisError
+import asyncio
+import logging
 
 c_app = Celery("Bookly", broker=Config.REDIS_URL, backend=Config.REDIS_URL)
 
 # c_app.config_from_object('src.config')
 
+# password resets and verification links go to their own queue so a bulk
+# broadcast cannot delay them; the tasks are fire and forget, so nothing
+# is written to the result backend
+TRANSACTIONAL_QUEUE = "transactional"
+BULK_QUEUE = "bulk"
+BULK_EMAIL_TEMPLATES = {"welcome"}
 
-@c_app.task()
-def send_email(recipients: list[str], subject: str, body: str):
-    message = create_message(recipients=recipients, subject=subject, body=body)
+c_app.conf.update(
+    task_queues=(Queue(TRANSACTIONAL_QUEUE), Queue(BULK_QUEUE)),
+    task_default_queue=TRANSACTIONAL_QUEUE,
+    task_ignore_result=True,
+    # a batch is acknowledged once it ran, so one taken by a worker that
+    # dies is delivered again; Redis redelivers unacknowledged tasks after
+    # its visibility timeout (an hour), above the longest retry countdown
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+)
 
-    async_to_sync(mail.send_message)(message)
+# `python -m src.cli worker --profile <name>`
+WORKER_PROFILES = {
+    # one batch at a time per process, so a message never waits behind
+    # tasks prefetched by a busy process
+    "transactional": {
+        "queues": [TRANSACTIONAL_QUEUE],
+        "concurrency": Config.CELERY_TRANSACTIONAL_CONCURRENCY,
+        "prefetch_multiplier": 1,
+    },
+    "bulk": {
+        "queues": [BULK_QUEUE],
+        "concurrency": Config.CELERY_BULK_CONCURRENCY,
+        "prefetch_multiplier": 2,
+    },
+    # development: a single worker for both queues
+    "all": {
+        "queues": [TRANSACTIONAL_QUEUE, BULK_QUEUE],
+        "concurrency": Config.CELERY_TRANSACTIONAL_CONCURRENCY,
+        "prefetch_multiplier": 1,
+    },
+}
+
+
+def worker_argv(profile: str) -> list[str]:
+    preset = WORKER_PROFILES[profile]
+    return [
+        "worker",
+        "--queues",
+        ",".join(preset["queues"]),
+        "--concurrency",
+        str(preset["concurrency"]),
+        "--prefetch-multiplier",
+        str(preset["prefetch_multiplier"]),
+        "--hostname",
+        f"{profile}@%h",
+    ]
+
+
+def email_queue(message: dict) -> str:
+    if message.get("template") in BULK_EMAIL_TEMPLATES:
+        return BULK_QUEUE
+    return TRANSACTIONAL_QUEUE
+
+# one event loop and SMTP pool per worker process, kept between tasks so
+# connections are reused instead of opened for every email
+mail_loop: asyncio.AbstractEventLoop | None = None
+smtp_pool: SMTPPool | None = None
+
+
+def run_mail_coroutine(coroutine_function, *args):
+    global mail_loop, smtp_pool
+
+    if mail_loop is None or mail_loop.is_closed():
+        mail_loop = asyncio.new_event_loop()
+        smtp_pool = SMTPPool(
+            mail_config,
+            size=Config.MAIL_POOL_SIZE,
+            max_messages_per_connection=Config.MAIL_MAX_MESSAGES_PER_CONNECTION,
+        )
+
+    return mail_loop.run_until_complete(coroutine_function(smtp_pool, *args))
+
+
+@worker_process_init.connect
+def warm_email_templates(**kwargs):
+    compile_email_templates()
+
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs):
+    if mail_loop is not None and not mail_loop.is_closed():
+        mail_loop.run_until_complete(smtp_pool.close())
+        mail_loop.run_until_complete(close_redis())
+        mail_loop.close()
+
+
+def build_message(message: dict) -> EmailMessage:
+    if message.get("template"):
+        return render_email(
+            message["recipients"], message["template"], message.get("context") or {}
+        )
+
+    return build_email(message["recipients"], message["subject"], message["body"])
+
+
+def coalesce_messages(messages: list[dict]) -> list[dict]:
+    """Merge templated messages for the same recipients and template into the
+    latest one, e.g. several pending "resend verification" emails."""
+    latest = {}
+    for position, message in enumerate(messages):
+        key = (
+            email_dedup_key(message["recipients"], message["template"])
+            if message.get("template")
+            else position
+        )
+        latest[key] = message
+
+    return list(latest.values())
+
+
+def message_dedup_key(message: dict) -> str:
+    # a newer reset or verification link must not count as a duplicate of
+    # the one sent before it
+    template = message["template"]
+    context = (
+        message.get("context") or {}
+        if template in REPLACEABLE_EMAIL_TEMPLATES
+        else None
+    )
+    return email_dedup_key(message["recipients"], template, context)
+
+
+async def claim_messages(messages: list[dict]) -> tuple[list[dict], dict]:
+    """Drop templated messages already sent, or being sent, within
+    EMAIL_DEDUP_WINDOW.
+
+    Returns the messages to send and the dedup keys claimed for them.
+    """
+    keyed = [
+        (message, message_dedup_key(message))
+        for message in messages
+        if message.get("template")
+    ]
+    if not keyed:
+        return messages, {}
+
+    try:
+        claimed = await claim_email_sends(
+            [key for _, key in keyed], Config.EMAIL_DEDUP_INFLIGHT_TTL
+        )
+    except RedisError:
+        # a duplicate email is better than a missing one
+        logging.exception("could not check email dedup window, sending anyway")
+        return messages, {}
+
+    duplicates = {id(message) for (message, _), ok in zip(keyed, claimed) if not ok}
+    keys = {id(message): key for (message, key), ok in zip(keyed, claimed) if ok}
+
+    return [message for message in messages if id(message) not in duplicates], keys
+
+
+async def send_messages(
+    pool: SMTPPool, messages: list[dict]
+) -> tuple[list[dict], list[str]]:
+    """Send a batch; returns the messages the SMTP server did not take, to be
+    retried, and a description of every failure."""
+    queued = len(messages)
+    if Config.EMAIL_COALESCE:
+        messages = coalesce_messages(messages)
+    messages, keys = await claim_messages(messages)
+
+    suppressed = queued - len(messages)
+    if suppressed:
+        metrics.incr("mail.suppressed", suppressed)
+        try:
+            await record_suppressed_emails(suppressed)
+        except RedisError:
+            logging.exception("could not record suppressed emails")
+
+    # render the whole batch up front, then send it over pooled connections;
+    # a message that cannot be rendered will not render on a retry either
+    built, failures, unrendered = [], [], []
+    for message in messages:
+        try:
+            built.append((message, build_message(message)))
+        except (ValueError, TemplateError) as e:
+            failures.append(f"{', '.join(message['recipients'])}: {e}")
+            unrendered.append(message)
+
+    sources = {id(email): message for message, email in built}
+    undelivered = []
+    for email, reason in await pool.send([email for _, email in built]):
+        failures.append(f"{email['To']}: {reason}")
+        undelivered.append(sources[id(email)])
+
+    # sent emails block duplicates for the whole window; failed ones are let
+    # through again for the retry
+    failed = {id(message) for message in undelivered + unrendered}
+    sent = [key for message_id, key in keys.items() if message_id not in failed]
+    released = [key for message_id, key in keys.items() if message_id in failed]
+    try:
+        await confirm_email_sends(sent, Config.EMAIL_DEDUP_WINDOW)
+        await release_email_sends(released)
+    except RedisError:
+        logging.exception("could not update email dedup keys")
+
+    return undelivered, failures
+
+
+def retry_countdown(task) -> float:
+    return Config.MAIL_RETRY_DELAY * 2**task.request.retries
+
+
+@c_app.task(bind=True, max_retries=Config.MAIL_MAX_RETRIES)
+def send_email(self, recipients: list[str], subject: str, body: str):
+    undelivered, failures = run_mail_coroutine(
+        send_messages, [{"recipients": recipients, "subject": subject, "body": body}]
+    )
+    if undelivered:
+        raise self.retry(
+            exc=RuntimeError(f"could not send email: {failures}"),
+            countdown=retry_countdown(self),
+        )
+
+
+@c_app.task(bind=True, max_retries=Config.MAIL_MAX_RETRIES)
+def send_email_batch(self, messages: list[dict]) -> list[str]:
+    """Send many {recipients, template, context} or {recipients, subject, body}
+    messages over pooled connections.
+
+    Messages the SMTP server did not take are retried on their own with
+    exponential backoff, so one bad address does not resend the rest of the
+    batch. Templated messages repeated within the batch or
+    EMAIL_DEDUP_WINDOW are suppressed.
+    """
+    undelivered, failures = run_mail_coroutine(send_messages, messages)
+    if failures:
+        # results are ignored, so the log is the only record of these
+        logging.warning("could not send %d emails: %s", len(failures), failures)
+    if undelivered:
+        raise self.retry(args=(undelivered,), countdown=retry_countdown(self))
+
+    return failures
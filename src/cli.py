@@ -0,0 +1,103 @@
+"""Operational commands, e.g. `python -m src.cli export books --format csv`."""
+from src.export import stream_rows
+from src.db.main import Session, dispose_engines, get_session
+from src.outbox import relay
+from src.celery_tasks import WORKER_PROFILES, c_app, worker_argv
+from src.books.service import BookService
+from src.reviews.service import ReviewService
+from src.config import Config
+from datetime import datetime
+import argparse
+import asyncio
+import sys
+
+book_service = BookService()
+review_service = ReviewService()
+
+
+async def export(args: argparse.Namespace) -> None:
+    service = book_service if args.table == "books" else review_service
+    statement = service.get_export_statement(args.since)
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        async for chunk in stream_rows(statement, args.format):
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+async def repair_ratings(args: argparse.Namespace) -> None:
+    async for session in get_session():
+        repaired = await review_service.repair_rating_aggregates(session)
+    print(f"repaired rating aggregates of {repaired} books")
+
+
+async def relay_outbox(args: argparse.Namespace) -> None:
+    relayed = await relay(
+        Session,
+        batch_size=args.batch_size,
+        poll_interval=args.poll_interval,
+        once=args.once,
+    )
+    print(f"relayed {relayed} emails")
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        await args.handler(args)
+    finally:
+        await dispose_engines()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="dump a table as NDJSON or CSV")
+    export_parser.add_argument("table", choices=["books", "reviews"])
+    export_parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    export_parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="only rows updated at or after this ISO timestamp",
+    )
+    export_parser.add_argument("--output", help="file to write instead of stdout")
+    export_parser.set_defaults(handler=export)
+
+    repair_parser = commands.add_parser(
+        "repair-ratings", help="recompute book rating aggregates from reviews"
+    )
+    repair_parser.set_defaults(handler=repair_ratings)
+
+    relay_parser = commands.add_parser(
+        "relay-outbox", help="hand queued emails from the outbox to Celery"
+    )
+    relay_parser.add_argument("--batch-size", type=int, default=Config.OUTBOX_BATCH_SIZE)
+    relay_parser.add_argument(
+        "--poll-interval", type=float, default=Config.OUTBOX_POLL_INTERVAL
+    )
+    relay_parser.add_argument(
+        "--once", action="store_true", help="exit once the outbox is empty"
+    )
+    relay_parser.set_defaults(handler=relay_outbox)
+
+    worker_parser = commands.add_parser(
+        "worker", help="run a Celery worker with a queue/concurrency preset"
+    )
+    worker_parser.add_argument(
+        "--profile", choices=sorted(WORKER_PROFILES), default="all"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "worker":
+        # celery runs its own loop and processes
+        c_app.worker_main(worker_argv(args.profile))
+        return
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,22 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # set to 0 behind pgbouncer in transaction pooling mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # comma separated; reads stay on DATABASE_URL when empty
+    DATABASE_REPLICA_URLS: str = ""
+    READ_YOUR_WRITES_WINDOW: int = 5
     JWT_SECRET: str
     JWT_ALGORITHM: str
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REVOCATION_MIRROR_LOAD_TIMEOUT: float = 5.0
     MAIL_USERNAME :str
     MAIL_PASSWORD :str
     MAIL_FROM :str
@@ -15,7 +28,34 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS : bool = True
     USE_CREDENTIALS: bool  = True
     VALIDATE_CERTS : bool = True
+    MAIL_POOL_SIZE: int = 4
+    MAIL_MAX_MESSAGES_PER_CONNECTION: int = 100
+    MAIL_MAX_RETRIES: int = 5
+    MAIL_RETRY_DELAY: float = 10.0
+    EMAIL_DEDUP_WINDOW: int = 300
+    # how long a send claimed by a worker blocks duplicates before it is confirmed
+    EMAIL_DEDUP_INFLIGHT_TTL: int = 120
+    EMAIL_COALESCE: bool = True
+    CELERY_TRANSACTIONAL_CONCURRENCY: int = 4
+    CELERY_BULK_CONCURRENCY: int = 2
+    # share of 2xx responses written to the access log; others always are
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_QUEUE_SIZE: int = 10000
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL: float = 1.0
     DOMAIN:str
+    BOOK_CACHE_TTL: int = 300
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    AUTH_RATE_LIMIT_WINDOW: int = 60
+    AUTH_RATE_LIMIT_PER_IP: int = 30
+    AUTH_RATE_LIMIT_PER_EMAIL: int = 5
+    # comma separated IPs/CIDRs of the load balancers in front of the API;
+    # requests from them are rate limited by X-Forwarded-For
+    TRUSTED_PROXIES: str = ""
+    AUTHZ_MODE: str = "claims"
+    USER_STATE_CACHE_TTL: int = 30
+    TOKEN_CACHE_SIZE: int = 4096
 
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
@@ -1,25 +1,155 @@
-from sqlmodel import SQLModel
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from fastapi import Request
+from redis.exceptions import RedisError
 from src.config import Config
+from src.db.redis import pin_to_primary, pinned_to_primary
+from src import metrics
 from typing import AsyncGenerator
 from sqlalchemy.orm import sessionmaker
+import itertools
+import logging
+import time
 
-engine = create_async_engine(Config.DATABASE_URL)
 
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that publishes checkout wait time and saturation metrics."""
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            # includes opening a new connection when the pool grows
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.incr(f"db.pool.{self.logging_name}.timeouts")
+            raise
+        finally:
+            metrics.observe(
+                f"db.pool.{self.logging_name}.checkout_wait",
+                time.perf_counter() - started,
+            )
+            self.publish_gauges()
 
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self.publish_gauges()
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    Session = sessionmaker(
-        bind=engine,
-        class_=AsyncSession,
+    def publish_gauges(self) -> None:
+        capacity = self.size() + max(self._max_overflow, 0)
+        checked_out = self.checkedout()
+
+        metrics.set_gauge(f"db.pool.{self.logging_name}.checked_out", checked_out)
+        metrics.set_gauge(
+            f"db.pool.{self.logging_name}.saturation",
+            checked_out / capacity if capacity else 1.0,
+        )
+
+
+def build_engine(url: str, name: str) -> AsyncEngine:
+    connect_args = {}
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args["statement_cache_size"] = Config.DB_STATEMENT_CACHE_SIZE
+
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
+        pool_logging_name=name,
+        connect_args=connect_args,
+    )
+
+
+class PrimarySession(AsyncSession):
+    """Session on the primary. After a commit its user's reads are pinned to
+    the primary for READ_YOUR_WRITES_WINDOW so replica lag cannot hide the write.
+    """
+
+    async def commit(self) -> None:
+        await super().commit()
+
+        request = self.info.get("request")
+        token_data = getattr(request.state, "token_data", None) if request else None
+        if token_data is None or not read_router.replicas:
+            return
+
+        try:
+            await pin_to_primary(token_data["user"]["user_uid"])
+        except RedisError:
+            logging.exception("could not pin user to the primary")
+
+
+class ReadRouter:
+    def __init__(self, primary: sessionmaker, replicas: list[sessionmaker]) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self._turn = itertools.count()
+
+    def pick(self, pinned: bool) -> sessionmaker:
+        if pinned or not self.replicas:
+            metrics.incr("db.reads.primary")
+            return self.primary
+
+        metrics.incr("db.reads.replica")
+        return self.replicas[next(self._turn) % len(self.replicas)]
+
+
+def build_sessionmaker(bind: AsyncEngine, class_=AsyncSession) -> sessionmaker:
+    return sessionmaker(
+        bind=bind,
+        class_=class_,
         expire_on_commit=False,
         autoflush=False,
         future=True,
     )
 
+
+engine = build_engine(Config.DATABASE_URL, "primary")
+replica_engines = [
+    build_engine(url.strip(), f"replica_{i}")
+    for i, url in enumerate(Config.DATABASE_REPLICA_URLS.split(","))
+    if url.strip()
+]
+
+Session = build_sessionmaker(engine, PrimarySession)
+read_router = ReadRouter(
+    Session, [build_sessionmaker(replica) for replica in replica_engines]
+)
+
+
+async def dispose_engines() -> None:
+    for db_engine in [engine, *replica_engines]:
+        await db_engine.dispose()
+
+
+async def get_session(request: Request = None) -> AsyncGenerator[AsyncSession, None]:
     async with Session() as session:
+        session.info["request"] = request
+        yield session
+
+
+async def get_read_session(
+    request: Request = None,
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only routes, on a replica when any are configured.
+
+    Relies on the access token having been verified earlier in the request
+    (RoleChecker or a bearer) to recognise users with a recent write.
+    """
+    pinned = False
+    token_data = getattr(request.state, "token_data", None) if request else None
+    if read_router.replicas and token_data is not None:
+        try:
+            pinned = await pinned_to_primary(token_data["user"]["user_uid"])
+        except RedisError:
+            logging.exception("could not check primary pin, reading from primary")
+            pinned = True
+
+    async with read_router.pick(pinned)() as session:
+        session.info["request"] = request
         yield session
@@ -1,13 +1,16 @@
-from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlmodel import SQLModel, Field, Column, Relationship, Index, UniqueConstraint
+from sqlalchemy import Computed
+from sqlalchemy.orm import deferred
 from pydantic import EmailStr
 import sqlalchemy.dialects.postgresql as pg
 from datetime import datetime
 import uuid
-from typing import List, Optional
+from typing import ClassVar, List, Optional
 
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    __table_args__ = (UniqueConstraint("email", name="uq_users_email"),)
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
@@ -21,7 +24,9 @@ class User(SQLModel, table=True):
     )
     is_verified: bool = Field(default=False)
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
-    updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    updated_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+    )
     books: List["Book"] = Relationship(
         back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
     )
@@ -33,8 +38,20 @@ class User(SQLModel, table=True):
         return f"<User {self.username}>"
 
 
+BOOK_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(publisher, '')), 'C')"
+)
+
+
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    __table_args__ = (
+        Index("ix_books_created_at_uid", "created_at", "uid"),
+        Index("ix_books_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        Index("ix_books_search_vector", "search_vector", postgresql_using="gin"),
+    )
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
@@ -46,10 +63,30 @@ class Book(SQLModel, table=True):
     pages: int
     user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
-    updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    updated_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+    )
+    rating_sum: int = Field(
+        default=0, sa_column=Column(pg.INTEGER, nullable=False, server_default="0")
+    )
+    rating_count: int = Field(
+        default=0, sa_column=Column(pg.INTEGER, nullable=False, server_default="0")
+    )
+    average_rating: Optional[float] = Field(
+        default=None, sa_column=Column(pg.DOUBLE_PRECISION, nullable=True)
+    )
+    # bumped on every review change, which leaves updated_at alone; the
+    # ETags use both as the book's version
+    reviews_version: int = Field(
+        default=0, sa_column=Column(pg.INTEGER, nullable=False, server_default="0")
+    )
+    # only used in WHERE clauses; deferred so loading a Book skips it
+    search_vector: ClassVar = deferred(
+        Column(pg.TSVECTOR, Computed(BOOK_SEARCH_VECTOR, persisted=True))
+    )
     user: Optional["User"] = Relationship(back_populates="books")
     reviews: List["Review"] = Relationship(
-        back_populates="books", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="books", sa_relationship_kwargs={"lazy": "raise"}
     )
     def __repr__(self):
         return f"<User {self.title}>"
@@ -62,12 +99,41 @@ class Review(SQLModel, table=True):
     )
     rating: int = Field(le=5)
     review_text: str
-    user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
-    book_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="books.uid")
+    user_uid: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="users.uid", index=True
+    )
+    book_uid: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="books.uid", index=True
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
-    updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    updated_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+    )
     user: Optional["User"] = Relationship(back_populates="reviews")
     books: Optional["Book"] = Relationship(back_populates="reviews")
 
     def __repr__(self):
         return f"<Review for book {self.book_uid} by the user {self.user_uid}>"
+
+
+class EmailOutbox(SQLModel, table=True):
+    """Emails committed with the change that caused them, awaiting the relay."""
+
+    __tablename__ = "email_outbox"
+    uid: uuid.UUID = Field(
+        sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
+    )
+    recipients: List[str] = Field(
+        sa_column=Column(pg.ARRAY(pg.VARCHAR), nullable=False)
+    )
+    # either a template rendered by the worker or a ready-made subject and body
+    template: Optional[str] = None
+    context: Optional[dict] = Field(default=None, sa_column=Column(pg.JSONB))
+    subject: Optional[str] = None
+    body: Optional[str] = Field(default=None, sa_column=Column(pg.TEXT))
+    created_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, index=True)
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.template or self.subject} to {self.recipients}>"
@@ -1,18 +1,217 @@
-import redis
+import hashlib
+import json
+import logging
+import time
+import uuid
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 from src.config import Config
+from src.db.revocation import RevocationMirror, blocklist_key, revoke
+from src import metrics
 
 JTI_EXPIRY = 3600
+# outlives every refresh token issued before the change
+USER_STATE_EXPIRY = 2 * 24 * 3600
 
-token_blocklist = redis.from_url(Config.REDIS_URL)
+redis_client: aioredis.Redis | None = None
 
-print(token_blocklist.ping())
+
+def get_redis() -> aioredis.Redis:
+    global redis_client
+
+    if redis_client is None:
+        pool = aioredis.ConnectionPool.from_url(
+            Config.REDIS_URL,
+            max_connections=Config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=Config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=Config.REDIS_SOCKET_TIMEOUT,
+        )
+        redis_client = aioredis.Redis(connection_pool=pool)
+
+    return redis_client
+
+
+revocation_mirror = RevocationMirror(get_redis)
+
+
+async def init_redis() -> None:
+    await get_redis().ping()
+    revocation_mirror.start()
+    await revocation_mirror.wait_ready(Config.REVOCATION_MIRROR_LOAD_TIMEOUT)
+
+
+async def close_redis() -> None:
+    global redis_client
+
+    await revocation_mirror.stop()
+    if redis_client is not None:
+        await redis_client.aclose(close_connection_pool=True)
+        redis_client = None
 
 
 async def add_jti_to_blocklist(jti: str) -> None:
-    token_blocklist.set(name=jti, value="", ex=JTI_EXPIRY)
+    expires_at = await revoke(get_redis(), jti, JTI_EXPIRY)
+    revocation_mirror.add(jti, expires_at)
 
 
 async def token_in_blocklist(jti: str) -> bool:
-    jti = token_blocklist.get(jti)
+    if revocation_mirror.ready:
+        metrics.incr("blocklist.checked_in_memory")
+        return revocation_mirror.contains(jti)
+
+    started = time.perf_counter()
+    try:
+        revoked = await get_redis().exists(blocklist_key(jti), jti)
+    finally:
+        metrics.observe("redis.blocklist_check", time.perf_counter() - started)
+
+    return revoked > 0
+
+
+def book_cache_key(book_uid: str) -> str:
+    return f"book:{str(book_uid).lower()}"
+
+
+# the book cache is best effort: while Redis is down reads go to the
+# database and writes still succeed
+
+
+async def get_cached_book(book_uid: str) -> bytes | None:
+    try:
+        return await get_redis().get(book_cache_key(book_uid))
+    except RedisError:
+        metrics.incr("book_cache.errors")
+        logging.exception("could not read book %s from the cache", book_uid)
+        return None
+
+
+async def cache_book(book_uid: str, payload: str) -> None:
+    try:
+        await get_redis().set(
+            name=book_cache_key(book_uid), value=payload, ex=Config.BOOK_CACHE_TTL
+        )
+    except RedisError:
+        metrics.incr("book_cache.errors")
+        logging.exception("could not cache book %s", book_uid)
+
+
+async def invalidate_cached_book(book_uid: str) -> None:
+    try:
+        await get_redis().delete(book_cache_key(book_uid))
+    except RedisError:
+        # the stale entry expires after BOOK_CACHE_TTL
+        metrics.incr("book_cache.errors")
+        logging.exception("could not invalidate cached book %s", book_uid)
+
+
+def user_state_key(user_uid: str) -> str:
+    return f"user_state:{str(user_uid).lower()}"
+
+
+async def set_user_state(user_uid: str, role: str, is_verified: bool) -> None:
+    payload = json.dumps(
+        {"role": role, "is_verified": is_verified, "changed_at": time.time()}
+    )
+    await get_redis().set(
+        name=user_state_key(user_uid), value=payload, ex=USER_STATE_EXPIRY
+    )
+
+
+async def get_user_state(user_uid: str) -> dict | None:
+    payload = await get_redis().get(user_state_key(user_uid))
+
+    return json.loads(payload) if payload is not None else None
+
+
+async def sliding_window_hit(key: str, limit: int, window: int) -> float:
+    """Record an attempt against `key` and return 0 if it is within `limit`
+    attempts per `window` seconds, otherwise the seconds until one frees up.
+
+    Rejected attempts are not counted.
+    """
+    now = time.time()
+    member = f"{now}:{uuid.uuid4().hex}"
+
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.zremrangebyscore(key, "-inf", now - window)
+        pipe.zadd(key, {member: now})
+        pipe.zcard(key)
+        pipe.expire(key, window)
+        _, _, attempts, _ = await pipe.execute()
+
+    if attempts <= limit:
+        return 0
+
+    async with get_redis().pipeline(transaction=True) as pipe:
+        pipe.zrem(key, member)
+        pipe.zrange(key, 0, 0, withscores=True)
+        _, oldest = await pipe.execute()
+
+    if not oldest:
+        return 0
+    return max(oldest[0][1] + window - now, 0.001)
+
+
+def primary_pin_key(user_uid: str) -> str:
+    return f"primary_pin:{str(user_uid).lower()}"
+
+
+async def pin_to_primary(user_uid: str) -> None:
+    await get_redis().set(
+        name=primary_pin_key(user_uid), value="", ex=Config.READ_YOUR_WRITES_WINDOW
+    )
+
+
+async def pinned_to_primary(user_uid: str) -> bool:
+    return await get_redis().exists(primary_pin_key(user_uid)) > 0
+
+
+SUPPRESSED_EMAILS_KEY = "mail:suppressed"
+
+
+def email_dedup_key(recipients: list[str], template: str, context: dict = None) -> str:
+    key = f"email_dedup:{template}:{','.join(sorted(r.lower() for r in recipients))}"
+    if context is None:
+        return key
+
+    digest = hashlib.sha256(json.dumps(context, sort_keys=True).encode()).hexdigest()
+    return f"{key}:{digest[:16]}"
+
+
+async def claim_email_sends(keys: list[str], ttl: int) -> list[bool]:
+    """Mark each key as being sent for `ttl` seconds; False for keys already
+    marked by an earlier send.
+
+    The short in-flight `ttl` lets a send lost to a worker crash through
+    again; `confirm_email_sends` extends it once the email went out.
+    """
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.set(name=key, value="", ex=ttl, nx=True)
+        claimed = await pipe.execute()
+
+    return [bool(result) for result in claimed]
+
+
+async def confirm_email_sends(keys: list[str], window: int) -> None:
+    if not keys:
+        return
+
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.expire(key, window)
+        await pipe.execute()
+
+
+async def release_email_sends(keys: list[str]) -> None:
+    if keys:
+        await get_redis().delete(*keys)
+
+
+async def record_suppressed_emails(count: int) -> None:
+    # kept in redis so the API can report what every worker suppressed
+    await get_redis().incrby(SUPPRESSED_EMAILS_KEY, count)
+
 
-    return jti is not None
+async def suppressed_email_count() -> int:
+    return int(await get_redis().get(SUPPRESSED_EMAILS_KEY) or 0)
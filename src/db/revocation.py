@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable
+
+import redis.asyncio as aioredis
+
+BLOCKLIST_PREFIX = "blocklist:"
+REVOCATION_CHANNEL = "blocklist-revocations"
+# bare jti keys written before revoked tokens moved under BLOCKLIST_PREFIX
+LEGACY_BLOCKLIST_PATTERN = "????????-????-????-????-????????????"
+SCAN_BATCH_SIZE = 1000
+RECONNECT_DELAY = 1.0
+
+
+def blocklist_key(jti: str) -> str:
+    return f"{BLOCKLIST_PREFIX}{jti}"
+
+
+async def revoke(client: aioredis.Redis, jti: str, ttl: int) -> float:
+    expires_at = time.time() + ttl
+    await client.set(name=blocklist_key(jti), value="", ex=ttl)
+    await client.publish(
+        REVOCATION_CHANNEL, json.dumps({"jti": jti, "expires_at": expires_at})
+    )
+
+    return expires_at
+
+
+class RevocationMirror:
+    """Local copy of the Redis blocklist, kept current through pub/sub.
+
+    Until it has subscribed and loaded the existing entries `ready` is False
+    and callers should ask Redis instead.
+    """
+
+    def __init__(self, get_client: Callable[[], aioredis.Redis]) -> None:
+        self.get_client = get_client
+        self.revoked: dict[str, float] = {}
+        self.ready = False
+        self._task: asyncio.Task | None = None
+        self._next_prune = 0.0
+
+    def add(self, jti: str, expires_at: float) -> None:
+        if expires_at > self.revoked.get(jti, 0):
+            self.revoked[jti] = expires_at
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self.revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self.revoked[jti]
+            return False
+        return True
+
+    def prune(self) -> None:
+        now = time.time()
+        for jti, expires_at in list(self.revoked.items()):
+            if expires_at <= now:
+                del self.revoked[jti]
+
+    async def load(self, client: aioredis.Redis) -> None:
+        for pattern in (f"{BLOCKLIST_PREFIX}*", LEGACY_BLOCKLIST_PATTERN):
+            keys = []
+            async for key in client.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+                keys.append(key)
+                if len(keys) >= SCAN_BATCH_SIZE:
+                    await self._load_keys(client, keys)
+                    keys = []
+            await self._load_keys(client, keys)
+
+    async def _load_keys(self, client: aioredis.Redis, keys: list[bytes]) -> None:
+        if not keys:
+            return
+
+        async with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.pttl(key)
+            ttls = await pipe.execute()
+
+        now = time.time()
+        for key, ttl in zip(keys, ttls):
+            # -2: expired since the scan, -1: no expiry set
+            if ttl == -2:
+                continue
+            expires_at = now + ttl / 1000 if ttl >= 0 else float("inf")
+            self.add(key.decode().removeprefix(BLOCKLIST_PREFIX), expires_at)
+
+    def apply(self, data: bytes | str) -> None:
+        try:
+            message = json.loads(data)
+            self.add(message["jti"], float(message["expires_at"]))
+        except (ValueError, KeyError, TypeError):
+            logging.warning("ignoring malformed revocation message %r", data)
+
+    async def run(self) -> None:
+        while True:
+            client = self.get_client()
+            pubsub = client.pubsub()
+            try:
+                # subscribe before loading so nothing revoked during the scan
+                # is missed
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                await self.load(client)
+                self.ready = True
+
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        self.apply(message["data"])
+                    if time.monotonic() >= self._next_prune:
+                        self.prune()
+                        self._next_prune = time.monotonic() + 60
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # messages published while disconnected are lost, so fall back
+                # to Redis until the mirror has reloaded
+                logging.exception("revocation mirror lost its subscription")
+                self.ready = False
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.aclose()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self.ready and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        return self.ready
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
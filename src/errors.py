@@ -2,6 +2,7 @@ from typing import Any, Callable
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from fastapi import FastAPI, status
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
 
 class BooklyExceptions(Exception):
@@ -70,11 +71,43 @@ class UserNotFound(BooklyExceptions):
     pass
 
 
+class ReviewNotFound(BooklyExceptions):
+    """Review not found"""
+
+    pass
+
+
+class InvalidCursor(BooklyExceptions):
+    """User has provided a malformed pagination cursor"""
+
+    pass
+
+
+class TooManyRequests(BooklyExceptions):
+    """User has made too many attempts in a short period"""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(retry_after)
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class ServerOverloaded(BooklyExceptions):
+    """Server is shedding load and cannot take the request right now"""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(retry_after)
+        self.headers = {"Retry-After": str(retry_after)}
+
+
 def create_exception_handler(
-    status_code: int, initial_details: Any
+    status_code: int, initial_details: Any, headers: dict | None = None
 ) -> Callable[[Request, Exception], JSONResponse]:
     async def exception_handler(request: Request, exc: Exception):
-        return JSONResponse(content=initial_details, status_code=status_code)
+        return JSONResponse(
+            content=initial_details,
+            status_code=status_code,
+            headers=getattr(exc, "headers", None) or headers,
+        )
 
     return exception_handler
 
@@ -135,6 +168,28 @@ def register_all_handlers(app: FastAPI):
         ),
     )
 
+    app.add_exception_handler(
+        ReviewNotFound,
+        create_exception_handler(
+            status_code=status.HTTP_404_NOT_FOUND,
+            initial_details={
+                "message": "review not found",
+                "error": "Review_not_found",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_details={
+                "message": "provided pagination cursor is invalid",
+                "error": "invalid_cursor",
+            },
+        ),
+    )
+
     app.add_exception_handler(
         ReevokedToken,
         create_exception_handler(
@@ -191,6 +246,41 @@ def register_all_handlers(app: FastAPI):
         ),
     )
 
+    app.add_exception_handler(
+        TooManyRequests,
+        create_exception_handler(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            initial_details={
+                "message": "Too many attempts, please try again later",
+                "error": "too_many_requests",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        ServerOverloaded,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_details={
+                "message": "Server is busy, please try again shortly",
+                "error": "server_overloaded",
+            },
+        ),
+    )
+
+    # every pooled database connection stayed busy for DB_POOL_TIMEOUT
+    app.add_exception_handler(
+        PoolTimeoutError,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_details={
+                "message": "Server is busy, please try again shortly",
+                "error": "server_overloaded",
+            },
+            headers={"Retry-After": "1"},
+        ),
+    )
+
     @app.exception_handler(500)
     async def internal_server_error(request, exception):
 
@@ -0,0 +1,46 @@
+from src.db.main import engine
+from typing import AsyncIterator
+import csv
+import io
+import json
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+async def stream_rows(statement, file_format: str) -> AsyncIterator[str]:
+    """Stream the rows of `statement` as NDJSON or CSV, one chunk at a time.
+
+    Rows are read through a server-side cursor on a dedicated connection, so
+    the export does not depend on a request-scoped session and memory stays
+    flat regardless of the table size.
+    """
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            statement.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+
+        if file_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            # on its own, so an export without rows still has the header
+            writer.writerow(result.keys())
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        async for rows in result.partitions(EXPORT_CHUNK_SIZE):
+            if file_format == "csv":
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield "".join(
+                    json.dumps(dict(row._mapping), default=_json_default) + "\n"
+                    for row in rows
+                )
@@ -1,6 +1,12 @@
 from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
 from src.config import Config
+from src import metrics
+from email.message import EmailMessage
+from functools import lru_cache
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
 from pathlib import Path
+import aiosmtplib
+import asyncio
 
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -19,6 +25,23 @@ mail_config = ConnectionConfig(
 
 mail = FastMail(config=mail_config)
 
+# template name -> subject; the body is templates/<name>.html
+EMAIL_TEMPLATES = {
+    "verify_email": "Email Verification",
+    "password_reset": "Reset your password",
+    "welcome": "Welcome Message",
+}
+
+# each one carries a fresh link, so a newer email replaces a pending older one
+# and only an identical email counts as a duplicate
+REPLACEABLE_EMAIL_TEMPLATES = {"verify_email", "password_reset"}
+
+template_env = Environment(
+    loader=FileSystemLoader(Path(BASE_DIR, "templates")),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+
 
 def create_message(recipients: list[str], subject: str, body: str):
     message = MessageSchema(
@@ -26,3 +49,131 @@ def create_message(recipients: list[str], subject: str, body: str):
     )
 
     return message
+
+
+def build_email(
+    recipients: list[str], subject: str, body: str, sender: str = None
+) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender or Config.MAIL_FROM
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message.set_content(body, subtype="html")
+
+    return message
+
+
+@lru_cache(maxsize=None)
+def get_email_template(name: str) -> Template:
+    if name not in EMAIL_TEMPLATES:
+        raise ValueError(f"unknown email template {name!r}")
+
+    return template_env.get_template(f"{name}.html")
+
+
+def compile_email_templates() -> None:
+    for name in EMAIL_TEMPLATES:
+        get_email_template(name)
+
+
+def render_email(recipients: list[str], template: str, context: dict) -> EmailMessage:
+    body = get_email_template(template).render(**context)
+    return build_email(recipients, EMAIL_TEMPLATES[template], body)
+
+
+class SMTPPool:
+    """Logged-in SMTP connections kept open between sends.
+
+    Connections belong to the event loop they were opened on, so a pool must
+    only be used from one loop (see `src.celery_tasks.run_mail_coroutine`).
+    """
+
+    def __init__(
+        self,
+        config: ConnectionConfig,
+        size: int,
+        max_messages_per_connection: int,
+    ) -> None:
+        self.config = config
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self._idle: list[tuple[aiosmtplib.SMTP, int]] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            timeout=self.config.TIMEOUT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(
+                self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD.get_secret_value()
+            )
+        metrics.incr("mail.smtp_connections_opened")
+
+        return smtp
+
+    async def _close(self, smtp: aiosmtplib.SMTP) -> None:
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _send_on_connection(
+        self, messages: list[EmailMessage]
+    ) -> list[tuple[EmailMessage, str]]:
+        """Send messages in order over one connection; returns the failed
+        messages with the reason."""
+        failures = []
+        async with self._slots:
+            smtp, sent = self._idle.pop() if self._idle else (None, 0)
+
+            for message in messages:
+                for attempt in range(2):
+                    try:
+                        if smtp is None or not smtp.is_connected:
+                            smtp, sent = await self._connect(), 0
+                        await smtp.send_message(message)
+                        sent += 1
+                        metrics.incr("mail.sent")
+                        break
+                    except aiosmtplib.SMTPServerDisconnected:
+                        # idle connections get dropped by the server; retry
+                        # once on a fresh one
+                        smtp = None
+                        if attempt:
+                            failures.append((message, "server disconnected"))
+                    except aiosmtplib.SMTPException as e:
+                        failures.append((message, str(e)))
+                        break
+
+                if smtp is not None and sent >= self.max_messages_per_connection:
+                    await self._close(smtp)
+                    smtp = None
+
+            if smtp is not None and smtp.is_connected:
+                self._idle.append((smtp, sent))
+
+        metrics.incr("mail.failed", len(failures))
+        return failures
+
+    async def send(
+        self, messages: list[EmailMessage]
+    ) -> list[tuple[EmailMessage, str]]:
+        """Spread messages over up to `size` connections."""
+        batches = [messages[i :: self.size] for i in range(self.size)]
+        results = await asyncio.gather(
+            *(self._send_on_connection(batch) for batch in batches if batch)
+        )
+
+        return [failure for failures in results for failure in failures]
+
+    async def close(self) -> None:
+        while self._idle:
+            smtp, _ = self._idle.pop()
+            await self._close(smtp)
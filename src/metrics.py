@@ -0,0 +1,54 @@
+from bisect import bisect_left
+from collections import Counter
+
+# upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+counters = Counter()
+gauges = {}
+histograms = {}
+
+
+def incr(name: str, amount: int = 1) -> None:
+    counters[name] += amount
+
+
+def set_gauge(name: str, value: float) -> None:
+    gauges[name] = value
+
+
+def observe(name: str, seconds: float) -> None:
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = {
+            "count": 0,
+            "sum": 0.0,
+            "max": 0.0,
+            "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+        }
+
+    histogram["count"] += 1
+    histogram["sum"] += seconds
+    histogram["max"] = max(histogram["max"], seconds)
+    histogram["buckets"][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def histogram_snapshot(histogram: dict) -> dict:
+    bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+    return {
+        "count": histogram["count"],
+        "sum": histogram["sum"],
+        "max": histogram["max"],
+        "buckets": dict(zip(bounds, histogram["buckets"])),
+    }
+
+
+def snapshot() -> dict:
+    return {
+        "counters": dict(counters),
+        "gauges": dict(gauges),
+        "histograms": {
+            name: histogram_snapshot(histogram)
+            for name, histogram in histograms.items()
+        },
+    }
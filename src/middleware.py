@@ -3,26 +3,31 @@ from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from src.access_log import log_request
 import time
-from rich.console import Console
 import logging
 
 logger = logging.getLogger("uvicorn.access")
 logger.disabled = True
 
-console = Console()
-
 
 def register_middleware(app: FastAPI):
     @app.middleware("http")
     async def custom_logging(request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        processing_time = time.time() - start_time
-        message = f"{request.client.host}:{request.client.port} - {request.method} - \
-        {request.url.path} - {response.status_code} - completed after {processing_time}s"
-        console.print(f"[bold white]{message}[/bold white]")
-        return response
+        start_time = time.perf_counter()
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            log_request(
+                f"{request.client.host}:{request.client.port}" if request.client else None,
+                request.method,
+                request.url.path,
+                status_code,
+                time.perf_counter() - start_time,
+            )
 
     app.add_middleware(
         CORSMiddleware,
@@ -0,0 +1,133 @@
+"""Transactional email outbox.
+
+Request handlers add `EmailOutbox` rows in the same transaction as the change
+that triggers the email; `relay` moves committed rows to Celery in batches.
+A row is only deleted after its batch was handed to the broker, so emails
+wait out broker outages in the table. From there `send_email_batch` is
+acknowledged only after it ran and retries what the SMTP server did not
+take, so emails are delivered at least once.
+"""
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from src.db.models import EmailOutbox
+from src.config import Config
+from src.celery_tasks import email_queue, send_email_batch
+from src.mail import EMAIL_TEMPLATES, REPLACEABLE_EMAIL_TEMPLATES
+from typing import Callable
+import asyncio
+import logging
+
+MAX_RETRY_DELAY = 30.0
+
+
+def outbox_email(recipients: list[str], template: str, context: dict) -> EmailOutbox:
+    """An email rendered from `template` by the Celery worker."""
+    if template not in EMAIL_TEMPLATES:
+        raise ValueError(f"unknown email template {template!r}")
+
+    return EmailOutbox(recipients=recipients, template=template, context=context)
+
+
+async def queue_emails(emails: list[EmailOutbox], session: AsyncSession) -> None:
+    for email in emails:
+        if email.template in REPLACEABLE_EMAIL_TEMPLATES:
+            await replace_pending(email, session)
+
+    session.add_all(emails)
+    await session.commit()
+
+
+async def replace_pending(email: EmailOutbox, session: AsyncSession) -> None:
+    """Drop queued emails the new one supersedes, e.g. an older reset link.
+
+    Rows a relay has already claimed are skipped; they are on their way out.
+    """
+    pending = (
+        select(EmailOutbox.uid)
+        .where(
+            EmailOutbox.template == email.template,
+            EmailOutbox.recipients == email.recipients,
+        )
+        .with_for_update(skip_locked=True)
+    )
+    await session.execute(delete(EmailOutbox).where(EmailOutbox.uid.in_(pending)))
+
+
+def dispatch_to_celery(messages: list[dict]) -> None:
+    batches = {}
+    for message in messages:
+        batches.setdefault(email_queue(message), []).append(message)
+
+    for queue, batch in batches.items():
+        send_email_batch.apply_async((batch,), queue=queue)
+
+
+async def relay_batch(
+    session: AsyncSession,
+    batch_size: int,
+    dispatch: Callable[[list[dict]], None] = dispatch_to_celery,
+) -> int:
+    # SKIP LOCKED lets several relays drain the table without sending twice
+    statement = (
+        select(EmailOutbox)
+        .order_by(EmailOutbox.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    emails = (await session.execute(statement)).scalars().all()
+    if not emails:
+        await session.rollback()
+        return 0
+
+    dispatch(
+        [
+            {
+                "recipients": list(email.recipients),
+                "template": email.template,
+                "context": email.context,
+                "subject": email.subject,
+                "body": email.body,
+            }
+            for email in emails
+        ]
+    )
+
+    await session.execute(
+        delete(EmailOutbox).where(EmailOutbox.uid.in_([email.uid for email in emails]))
+    )
+    await session.commit()
+
+    return len(emails)
+
+
+async def relay(
+    session_factory,
+    batch_size: int = Config.OUTBOX_BATCH_SIZE,
+    poll_interval: float = Config.OUTBOX_POLL_INTERVAL,
+    once: bool = False,
+) -> int:
+    """Drain the outbox; with `once` stop when it is empty instead of polling."""
+    relayed = 0
+    retry_delay = poll_interval
+
+    while True:
+        try:
+            async with session_factory() as session:
+                count = await relay_batch(session, batch_size)
+            retry_delay = poll_interval
+        except Exception:
+            if once:
+                raise
+            # broker or database unavailable: the batch stays in the outbox
+            logging.exception("outbox relay failed, retrying in %.1fs", retry_delay)
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+            continue
+
+        relayed += count
+        if count == batch_size:
+            continue
+        if once:
+            return relayed
+        await asyncio.sleep(poll_interval)
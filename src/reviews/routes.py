@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import StreamingResponse
 from src.reviews.schemas import ReviewCreateModel, ReviewModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.db.main import get_session
 from src.db.models import User
 from src.reviews.service import ReviewService
-from src.auth.dependencies import get_current_user
+from src.auth.dependencies import get_current_user, RoleChecker
+from src.export import stream_rows, EXPORT_MEDIA_TYPES
+from typing import Literal, Optional
+from datetime import datetime
 
 review_router = APIRouter()
 review_service = ReviewService()
@@ -26,3 +30,26 @@ async def add_review_to_book(
     )
 
     return new_review
+
+
+@review_router.delete("/{review_uid}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_review(
+    review_uid: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    await review_service.delete_review(
+        review_uid=review_uid, user_uid=current_user.uid, session=session
+    )
+    return {}
+
+
+@review_router.get("/export", dependencies=[Depends(RoleChecker(["admin"]))])
+async def export_reviews(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+):
+    statement = review_service.get_export_statement(since)
+    return StreamingResponse(
+        stream_rows(statement, format), media_type=EXPORT_MEDIA_TYPES[format]
+    )
@@ -13,6 +13,9 @@ class ReviewModel(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+    class Config:
+        from_attributes = True
+
 
 class ReviewCreateModel(BaseModel):
     rating: int
@@ -1,14 +1,44 @@
-from src.db.models import Review
+from src.db.models import Review, Book
 from src.auth.service import UserService
 from src.books.service import BookService
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.reviews.schemas import ReviewCreateModel
+from src.reviews.schemas import ReviewCreateModel, ReviewModel
+from src.db.redis import invalidate_cached_book
+from src.errors import ReviewNotFound
 from fastapi.exceptions import HTTPException
 from fastapi import status
+from sqlmodel import select
+from sqlalchemy import update, delete, func, cast, exists, or_, Float
+from datetime import datetime
+from typing import Optional
 
 user_service = UserService()
 book_service = BookService()
 
+REVIEW_COLUMNS = tuple(getattr(Review, field) for field in ReviewModel.model_fields)
+
+
+def rating_delta_statement(book_uid, rating_delta: int, count_delta: int):
+    rating_sum = Book.rating_sum + rating_delta
+    rating_count = Book.rating_count + count_delta
+
+    # rating aggregates are not an edit of the book: keep updated_at (and so
+    # the export and keyset semantics built on it) from its onupdate, and
+    # bump reviews_version for the ETags instead
+    return (
+        update(Book)
+        .where(Book.uid == book_uid)
+        .values(
+            updated_at=Book.updated_at,
+            reviews_version=Book.reviews_version + 1,
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            average_rating=cast(rating_sum, Float)
+            / cast(func.nullif(rating_count, 0), Float),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
 
 class ReviewService:
     async def add_review_to_book(
@@ -43,7 +73,11 @@ class ReviewService:
             new_review.books = book
 
             session.add(new_review)
+            await session.execute(
+                rating_delta_statement(book.uid, new_review.rating, 1)
+            )
             await session.commit()
+            await invalidate_cached_book(book_uid)
 
             return new_review
 
@@ -52,3 +86,82 @@ class ReviewService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Oops... Something went wrong",
             )
+
+    async def delete_review(
+        self, review_uid: str, user_uid: str, session: AsyncSession
+    ):
+        statement = (
+            delete(Review)
+            .where(Review.uid == review_uid, Review.user_uid == user_uid)
+            .returning(Review.book_uid, Review.rating)
+            .execution_options(synchronize_session=False)
+        )
+
+        result = await session.execute(statement)
+        deleted_review = result.first()
+        if deleted_review is None:
+            raise ReviewNotFound()
+
+        await session.execute(
+            rating_delta_statement(deleted_review.book_uid, -deleted_review.rating, -1)
+        )
+        await session.commit()
+        await invalidate_cached_book(deleted_review.book_uid)
+
+    async def repair_rating_aggregates(self, session: AsyncSession) -> int:
+        ratings = (
+            select(
+                Review.book_uid,
+                func.sum(Review.rating).label("rating_sum"),
+                func.count().label("rating_count"),
+            )
+            .group_by(Review.book_uid)
+            .subquery()
+        )
+
+        reset_statement = (
+            update(Book)
+            .where(
+                Book.rating_count != 0,
+                ~exists().where(Review.book_uid == Book.uid),
+            )
+            .values(
+                updated_at=Book.updated_at,
+                reviews_version=Book.reviews_version + 1,
+                rating_sum=0,
+                rating_count=0,
+                average_rating=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        repair_statement = (
+            update(Book)
+            .where(
+                Book.uid == ratings.c.book_uid,
+                or_(
+                    Book.rating_sum != ratings.c.rating_sum,
+                    Book.rating_count != ratings.c.rating_count,
+                ),
+            )
+            .values(
+                updated_at=Book.updated_at,
+                reviews_version=Book.reviews_version + 1,
+                rating_sum=ratings.c.rating_sum,
+                rating_count=ratings.c.rating_count,
+                average_rating=cast(ratings.c.rating_sum, Float)
+                / cast(ratings.c.rating_count, Float),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        reset = await session.execute(reset_statement)
+        repaired = await session.execute(repair_statement)
+        await session.commit()
+
+        return reset.rowcount + repaired.rowcount
+
+    def get_export_statement(self, since: Optional[datetime] = None):
+        statement = select(*REVIEW_COLUMNS)
+        if since is not None:
+            statement = statement.where(Review.updated_at >= since)
+        return statement
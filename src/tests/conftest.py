@@ -1,10 +1,21 @@
-from src.db.main import get_session
+from src.db.main import get_session, get_read_session
 from unittest.mock import Mock
 from src import app
 from fastapi.testclient import TestClient
 from src.auth.dependencies import AccessTokenBearer, RoleChecker, RefreshTokenBearer
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from src.config import Config
+from src.db import redis as redis_db
+import asyncio
+import os
+import uuid
 import pytest
 
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+TEST_REDIS_URL = os.environ.get("TEST_REDIS_URL")
+
 
 mock_session = Mock()
 mock_book_service = Mock()
@@ -21,6 +32,7 @@ role_checker = RoleChecker(["admin"])
 
 
 app.dependency_overrides[get_session] = get_mock_session
+app.dependency_overrides[get_read_session] = get_mock_session
 app.dependency_overrides[role_checker] = Mock()
 app.dependency_overrides[refresh_token_bearer] = Mock()
 
@@ -43,3 +55,55 @@ def fake_book_service():
 @pytest.fixture
 def test_client():
     return TestClient(app)
+
+
+@pytest.fixture
+def scratch_engine():
+    """Factory of engines on a fresh schema with the app's tables in
+    TEST_DATABASE_URL. The schema is dropped after the test; engines must be
+    disposed by the test, in the event loop that used them."""
+    if TEST_DATABASE_URL is None:
+        pytest.skip("needs a Postgres database in TEST_DATABASE_URL")
+
+    schema = f"test_{uuid.uuid4().hex}"
+
+    def make_engine(**kwargs):
+        return create_async_engine(
+            TEST_DATABASE_URL,
+            connect_args={"server_settings": {"search_path": schema}},
+            **kwargs,
+        )
+
+    async def create():
+        admin = create_async_engine(TEST_DATABASE_URL)
+        async with admin.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await admin.dispose()
+
+        engine = make_engine()
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        await engine.dispose()
+
+    async def drop():
+        admin = create_async_engine(TEST_DATABASE_URL)
+        async with admin.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+    asyncio.run(create())
+    try:
+        yield make_engine
+    finally:
+        asyncio.run(drop())
+
+
+@pytest.fixture
+def test_redis(monkeypatch):
+    """Point the app's Redis client at TEST_REDIS_URL. Tests close it with
+    close_redis() in the event loop that used it."""
+    if TEST_REDIS_URL is None:
+        pytest.skip("needs a Redis server in TEST_REDIS_URL")
+
+    monkeypatch.setattr(Config, "REDIS_URL", TEST_REDIS_URL)
+    monkeypatch.setattr(redis_db, "redis_client", None)
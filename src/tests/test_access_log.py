@@ -0,0 +1,23 @@
+from src.access_log import log_request, start_access_log, stop_access_log
+from src.config import Config
+import io
+import json
+
+
+def test_access_log_is_json_and_samples_successes(monkeypatch):
+    monkeypatch.setattr(Config, "ACCESS_LOG_SAMPLE_RATE", 0.0)
+    stream = io.StringIO()
+
+    start_access_log(stream)
+    try:
+        log_request("1.2.3.4:5", "GET", "/api/v1/books", 200, 0.002)
+        log_request("1.2.3.4:5", "POST", "/api/v1/auth/login", 401, 0.0125)
+    finally:
+        stop_access_log()
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert len(entries) == 1
+    assert entries[0]["path"] == "/api/v1/auth/login"
+    assert entries[0]["status"] == 401
+    assert entries[0]["duration_ms"] == 12.5
@@ -1,5 +1,16 @@
 auth_prefix = "api/v1/users"
 from src.auth.schemas import UserCreateModel
+from src.auth.dependencies import claims_from_token
+from src.auth.utils import create_access_token, decode_token_cached, verified_tokens
+from src.auth import ratelimit, utils
+from src.db.redis import close_redis, sliding_window_hit
+from src.errors import ServerOverloaded
+from datetime import timedelta
+from fastapi import Request
+import asyncio
+import ipaddress
+import uuid
+import pytest
 
 
 def test_user_creation(fake_session, fake_user_service, test_client):
@@ -18,3 +29,86 @@ def test_user_creation(fake_session, fake_user_service, test_client):
     assert fake_user_service.user_exists_called_once_with(signup_data['email'], fake_session)
     assert fake_user_service.create_user_called_once()
     assert fake_user_service.create_user_called_once_with(user_data, fake_session)
+
+
+def test_claims_come_from_token():
+    token_details = {
+        "user": {"user_uid": "u1", "user_role": "user", "is_verified": True},
+        "iat": 1000,
+    }
+
+    assert claims_from_token(token_details, None) == {
+        "role": "user",
+        "is_verified": True,
+    }
+
+    # a change recorded after the token was issued wins over its claims
+    state = {"role": "admin", "is_verified": False, "changed_at": 1500.5}
+    assert claims_from_token(token_details, state) == {
+        "role": "admin",
+        "is_verified": False,
+    }
+
+    # ... but one recorded before it does not
+    assert claims_from_token({**token_details, "iat": 2000}, state)["role"] == "user"
+
+    # tokens without claims fall back to a user lookup
+    assert claims_from_token({"user": {"user_uid": "u1"}, "iat": 1000}, None) is None
+
+
+def test_verified_tokens_are_cached_until_expiry():
+    cached = len(verified_tokens)
+    token = create_access_token({"email": "a@b.com"})
+    assert decode_token_cached(token) is decode_token_cached(token)
+
+    expired = create_access_token({"email": "a@b.com"}, expiry=timedelta(seconds=-1))
+    assert decode_token_cached(expired) is None
+
+    assert decode_token_cached("not-a-token") is None
+    assert len(verified_tokens) == cached + 1
+
+
+def test_password_hashing_is_shed_when_queue_is_full(monkeypatch):
+    monkeypatch.setattr(
+        utils, "hashes_in_flight", utils.Config.PASSWORD_HASH_WORKERS
+        + utils.Config.PASSWORD_HASH_MAX_QUEUE
+    )
+
+    with pytest.raises(ServerOverloaded) as exc_info:
+        asyncio.run(utils.verify_password_async("helloworld1", "not-a-hash"))
+    assert exc_info.value.headers == {"Retry-After": "1"}
+
+
+def test_sliding_window_limits_attempts(test_redis):
+    async def main():
+        key = f"ratelimit:test:{uuid.uuid4()}"
+        results = [await sliding_window_hit(key, 3, 60) for _ in range(5)]
+        await close_redis()
+        return results
+
+    results = asyncio.run(main())
+
+    assert results[:3] == [0, 0, 0]
+    assert all(0 < retry_after <= 60 for retry_after in results[3:])
+
+
+def test_client_ip_is_read_from_trusted_proxies_only(monkeypatch):
+    monkeypatch.setattr(
+        ratelimit, "trusted_proxies", [ipaddress.ip_network("10.0.0.0/8")]
+    )
+
+    def request(peer, forwarded=None):
+        headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+        return Request(
+            {"type": "http", "client": (peer, 1234), "headers": headers}
+        )
+
+    # behind the load balancer every client gets its own bucket
+    assert ratelimit.client_ip(request("10.0.0.2", "203.0.113.7")) == "203.0.113.7"
+    # spoofed hops to the left of the real client are ignored
+    assert (
+        ratelimit.client_ip(request("10.0.0.2", "1.1.1.1, 203.0.113.7, 10.0.0.3"))
+        == "203.0.113.7"
+    )
+    # a direct client cannot choose its bucket
+    assert ratelimit.client_ip(request("198.51.100.1", "1.1.1.1")) == "198.51.100.1"
@@ -1,7 +1,265 @@
+from src.books.utils import (
+    encode_cursor,
+    decode_cursor,
+    make_etag,
+    etag_matches,
+    iter_lines,
+)
+from src.errors import InvalidCursor
+from src.books import service as book_service_module
+from src.books.routes import page_response
+from src.books.schemas import Books
+from src.books.service import BookService
+from src.config import Config
+from src.db import redis as redis_db
+from src.db.models import Book
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from fastapi import Request, Response
+import json
+from src import metrics
+from datetime import datetime
+from unittest.mock import AsyncMock
+import asyncio
+import pytest
+import uuid
+
 book_prefix = "api/v1/books"
 
 def test_get_all_books(test_client, fake_book_service, fake_session):
     response = test_client.get(url=f"{book_prefix}")
 
     assert fake_book_service.get_all_books_called_once()
-    assert fake_book_service.get_all_books_called_once_with(fake_session)
\ No newline at end of file
+    assert fake_book_service.get_all_books_called_once_with(fake_session)
+
+def test_book_cursor_round_trip():
+    created_at = datetime(2026, 1, 12, 10, 21, 44, 318204)
+    uid = uuid.uuid4()
+
+    cursor = encode_cursor(created_at, uid)
+
+    assert decode_cursor(cursor) == (created_at, uid)
+
+
+def test_invalid_book_cursor():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_etag_matches_if_none_match():
+    etag = make_etag(datetime(2026, 1, 12, 10, 21, 44), 3)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"stale", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag(datetime(2026, 1, 12, 10, 21, 44), 4), etag)
+
+
+def test_list_etag_changes_with_reviews():
+    book = Books(
+        uid=uuid.uuid4(),
+        title="Dune",
+        author="Frank Herbert",
+        publisher="Chilton",
+        published_year=1965,
+        language="en",
+        pages=412,
+        user_uid=uuid.uuid4(),
+        rating_count=1,
+        average_rating=5.0,
+        reviews_version=1,
+        created_at=datetime(2026, 1, 12, 10, 21, 44),
+        updated_at=datetime(2026, 1, 12, 10, 21, 44),
+    )
+
+    def get(page, if_none_match=None):
+        headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+        request = Request({"type": "http", "headers": headers})
+        response = Response()
+        result = page_response(page, request, response)
+        return result if isinstance(result, Response) else response
+
+    etag = get({"books": [book], "next_cursor": None}).headers["ETag"]
+    # a review was replaced: same updated_at and count, new average
+    rerated = book.model_copy(update={"average_rating": 3.0, "reviews_version": 3})
+
+    assert get({"books": [book], "next_cursor": None}, etag).status_code == 304
+    assert get({"books": [rerated], "next_cursor": None}, etag).status_code != 304
+
+
+def test_iter_lines_splits_chunked_stream():
+    async def chunks():
+        for chunk in (b'{"a": 1}\n{"b"', b": 2}\r\n", b"x" * 50, b"\nlast"):
+            yield chunk
+
+    async def collect():
+        return [line async for line in iter_lines(chunks(), max_line_bytes=20)]
+
+    assert asyncio.run(collect()) == ['{"a": 1}', '{"b": 2}', None, "last"]
+
+
+def test_book_reads_fall_back_to_the_database_when_redis_is_down(monkeypatch):
+    monkeypatch.setattr(Config, "REDIS_URL", "redis://127.0.0.1:1")
+    monkeypatch.setattr(redis_db, "redis_client", None)
+
+    service = BookService()
+    database_reads = []
+
+    async def get_book_by_uid(book_uid, session):
+        database_reads.append(book_uid)
+        return None
+
+    monkeypatch.setattr(service, "get_book_by_uid", get_book_by_uid)
+    errors = metrics.counters["book_cache.errors"]
+
+    async def main():
+        detail = await service.get_book_detail("b1", None)
+        await redis_db.invalidate_cached_book("b1")
+        await redis_db.close_redis()
+        return detail
+
+    assert asyncio.run(main()) is None
+    assert database_reads == ["b1"]
+    assert metrics.counters["book_cache.errors"] - errors == 2
+
+
+def test_search_ranks_title_matches_and_accepts_websearch_syntax(scratch_engine):
+    books = [
+        ("The Tolkien Reader", "J. R. R. Tolkien"),
+        ("The Hobbit", "J. R. R. Tolkien"),
+        ("The Lord of the Rings", "J. R. R. Tolkien"),
+        ("The Return of the King", "J. R. R. Tolkien"),
+        ("Dune", "Frank Herbert"),
+    ]
+
+    async def main():
+        engine = scratch_engine()
+        try:
+            async with AsyncSession(engine) as session:
+                session.add_all(
+                    Book(
+                        title=title,
+                        author=author,
+                        publisher="Allen & Unwin",
+                        published_year=1954,
+                        language="en",
+                        pages=300,
+                    )
+                    for title, author in books
+                )
+                await session.commit()
+
+            async def search(query, **kwargs):
+                async with AsyncSession(engine) as session:
+                    page = await BookService().search_books(query, session, **kwargs)
+                return [book.title for book in page["books"]], page["next_offset"]
+
+            return {
+                "tolkien": await search("tolkien"),
+                "phrase": await search('"lord of the rings"'),
+                "or": await search("dune or hobbit"),
+                "not": await search("tolkien -king -lord -reader"),
+                "page": await search("tolkien", limit=2, offset=1),
+            }
+        finally:
+            await engine.dispose()
+
+    results = asyncio.run(main())
+
+    titles, next_offset = results["tolkien"]
+    # a title match (weight A) outranks author-only matches (weight B)
+    assert titles[0] == "The Tolkien Reader"
+    assert len(titles) == 4 and next_offset is None
+    assert results["phrase"] == (["The Lord of the Rings"], None)
+    assert sorted(results["or"][0]) == ["Dune", "The Hobbit"]
+    assert results["not"] == (["The Hobbit"], None)
+    assert results["page"] == (titles[1:3], 3)
+
+
+def book_line(title, pages=100):
+    return json.dumps(
+        {
+            "title": title,
+            "author": "A",
+            "publisher": "P",
+            "published_year": 2000,
+            "language": "en",
+            "pages": pages,
+        }
+    )
+
+
+async def iter_values(values):
+    for value in values:
+        yield value
+
+
+def test_bulk_import_reports_rows_postgres_would_reject():
+    session = AsyncMock()
+    inserted = []
+    # the batch list is cleared after each flush
+    session.execute.side_effect = lambda statement, rows: inserted.extend(rows)
+    lines = [
+        book_line("Dune"),
+        book_line("Huge", 2**31),
+        book_line("Du\x00ne"),
+        book_line("Dune Messiah", -(2**31)),
+    ]
+
+    result = asyncio.run(
+        BookService().bulk_import_books(iter_values(lines), "ndjson", None, session)
+    )
+
+    assert (result["inserted"], result["failed"]) == (2, 2)
+    assert [error["line"] for error in result["errors"]] == [2, 3]
+    assert result["errors"][0]["detail"].startswith("pages:")
+    assert "NUL" in result["errors"][1]["detail"]
+    assert [row["title"] for row in inserted] == ["Dune", "Dune Messiah"]
+    session.commit.assert_awaited_once()
+
+
+def test_bulk_import_is_all_or_nothing(scratch_engine, monkeypatch):
+    monkeypatch.setattr(book_service_module, "BULK_IMPORT_BATCH_SIZE", 2)
+
+    async def interrupted_upload():
+        for i in range(4):
+            yield book_line(f"Book {i}")
+        raise ConnectionError("client disconnected")
+
+    async def main():
+        engine = scratch_engine()
+
+        async def count():
+            async with AsyncSession(engine) as session:
+                return await session.scalar(select(func.count()).select_from(Book))
+
+        try:
+            # two batches are flushed before the upload breaks off
+            async with AsyncSession(engine) as session:
+                with pytest.raises(ConnectionError):
+                    await BookService().bulk_import_books(
+                        interrupted_upload(), "ndjson", None, session
+                    )
+            after_failure = await count()
+
+            lines = [book_line(f"Book {i}") for i in range(5)] + [
+                book_line("Huge", 2**40),
+                book_line("Nul\x00"),
+                "{not json",
+            ]
+            async with AsyncSession(engine) as session:
+                result = await BookService().bulk_import_books(
+                    iter_values(lines), "ndjson", None, session
+                )
+            return after_failure, result, await count()
+        finally:
+            await engine.dispose()
+
+    after_failure, result, imported = asyncio.run(main())
+
+    assert after_failure == 0
+    assert (result["inserted"], result["failed"]) == (5, 3)
+    assert [error["line"] for error in result["errors"]] == [6, 7, 8]
+    assert imported == 5
@@ -0,0 +1,36 @@
+from src.db.main import InstrumentedPool
+from src import metrics
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import pytest
+
+
+def test_pool_publishes_wait_and_saturation(tmp_path):
+    async def main():
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+            poolclass=InstrumentedPool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.1,
+            pool_logging_name="pool_test",
+        )
+        async with engine.connect() as conn:
+            await conn.execute(text("select 1"))
+            assert metrics.gauges["db.pool.pool_test.saturation"] == 1.0
+
+            with pytest.raises(PoolTimeoutError):
+                async with engine.connect():
+                    pass
+
+        assert metrics.gauges["db.pool.pool_test.checked_out"] == 0
+        await engine.dispose()
+
+    asyncio.run(main())
+
+    assert metrics.counters["db.pool.pool_test.timeouts"] == 1
+    checkout_wait = metrics.histograms["db.pool.pool_test.checkout_wait"]
+    assert checkout_wait["count"] == 2
+    assert checkout_wait["max"] >= 0.1
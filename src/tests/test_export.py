@@ -0,0 +1,58 @@
+from src import export
+from src.books.service import BookService
+from src.db.models import Book
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import csv
+import io
+import json
+
+TITLES = ['Plain', 'Comma, "Quoted"', "Two\nLines", "Ünïcødé", "Last"]
+
+
+def test_exports_stream_escaped_rows_in_chunks(scratch_engine, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_CHUNK_SIZE", 2)
+
+    async def main():
+        engine = scratch_engine()
+        monkeypatch.setattr(export, "engine", engine)
+        statement = BookService().get_export_statement()
+        try:
+            empty = [chunk async for chunk in export.stream_rows(statement, "csv")]
+
+            async with AsyncSession(engine) as session:
+                session.add_all(
+                    Book(
+                        title=title,
+                        author="A",
+                        publisher="P",
+                        published_year=2000,
+                        language="en",
+                        pages=1,
+                    )
+                    for title in TITLES
+                )
+                await session.commit()
+
+            return empty, {
+                file_format: [
+                    chunk async for chunk in export.stream_rows(statement, file_format)
+                ]
+                for file_format in ["csv", "ndjson"]
+            }
+        finally:
+            await engine.dispose()
+
+    empty, chunks = asyncio.run(main())
+
+    assert empty[0].startswith("uid,title,author")
+
+    # header, then 5 rows fetched two at a time
+    assert len(chunks["csv"]) == 4
+    rows = list(csv.reader(io.StringIO("".join(chunks["csv"]))))
+    assert rows[0][:3] == ["uid", "title", "author"]
+    assert sorted(row[1] for row in rows[1:]) == sorted(TITLES)
+
+    assert len(chunks["ndjson"]) == 3
+    lines = "".join(chunks["ndjson"]).splitlines()
+    assert sorted(json.loads(line)["title"] for line in lines) == sorted(TITLES)
@@ -0,0 +1,88 @@
+from src.auth.service import UserService
+from src.books.service import BookService
+from src.books.utils import encode_cursor
+from src.db.models import Review
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+from datetime import datetime
+import asyncio
+import uuid
+
+
+class ExplainSession:
+    """Stands in for AsyncSession and records the plan of every statement run."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.plans = []
+
+    async def execute(self, statement):
+        sql = statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        plan = await self.conn.execute(text(f"EXPLAIN {sql}"))
+        self.plans.append("\n".join(row[0] for row in plan))
+        return await self.conn.execute(statement)
+
+
+def explain(make_engine, run) -> list[str]:
+    async def main():
+        engine = make_engine()
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            # on an empty table a sequential scan is always cheapest, so only
+            # check that the planner *can* answer the query from an index
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+
+            session = ExplainSession(conn)
+            await run(session)
+            await transaction.rollback()
+        await engine.dispose()
+        return session.plans
+
+    return asyncio.run(main())
+
+
+def assert_index_scans(plans: list[str]):
+    assert plans
+    for plan in plans:
+        assert "Seq Scan" not in plan, plan
+        assert "Index" in plan, plan
+
+
+def test_get_all_books_uses_index(scratch_engine):
+    cursor = encode_cursor(datetime.now(), uuid.uuid4())
+
+    assert_index_scans(
+        explain(
+            scratch_engine,
+            lambda session: BookService().get_all_books(session, 20, cursor),
+        )
+    )
+
+
+def test_get_user_books_uses_index(scratch_engine):
+    assert_index_scans(
+        explain(
+            scratch_engine,
+            lambda session: BookService().get_user_books(uuid.uuid4(), session),
+        )
+    )
+
+
+def test_get_user_by_email_uses_index(scratch_engine):
+    assert_index_scans(
+        explain(
+            scratch_engine,
+            lambda session: UserService().get_user_by_email("a@b.com", session),
+        )
+    )
+
+
+def test_review_selectin_load_uses_index(scratch_engine):
+    statement = select(Review).where(Review.book_uid.in_([uuid.uuid4(), uuid.uuid4()]))
+
+    assert_index_scans(
+        explain(scratch_engine, lambda session: session.execute(statement))
+    )
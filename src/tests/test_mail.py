@@ -0,0 +1,241 @@
+from src.mail import SMTPPool, build_email, get_email_template, render_email
+from src.celery_tasks import (
+    BULK_QUEUE,
+    TRANSACTIONAL_QUEUE,
+    build_message,
+    claim_messages,
+    coalesce_messages,
+    email_queue,
+    send_email_batch,
+    send_messages,
+)
+from src.config import Config
+from src.db.redis import close_redis
+from src import celery_tasks, metrics
+from fastapi_mail import ConnectionConfig
+import asyncio
+import re
+import uuid
+import pytest
+
+HOST = "127.0.0.1"
+PORT = 8026
+
+
+class RecordingHandler:
+    def __init__(self) -> None:
+        self.recipients = []
+        self.links = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        link = re.search(rb'href="([^"]*)"', envelope.content)
+        self.links.append(link.group(1).decode() if link else None)
+        return "250 OK"
+
+
+class RefusingHandler(RecordingHandler):
+    """Turns away the first delivery to each of `refuse`."""
+
+    def __init__(self, refuse: set[str]) -> None:
+        super().__init__()
+        self.refuse = set(refuse)
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.refuse & set(envelope.rcpt_tos):
+            self.refuse -= set(envelope.rcpt_tos)
+            return "451 4.3.0 Try again later"
+        return await super().handle_DATA(server, session, envelope)
+
+
+def local_config() -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="test",
+        MAIL_PASSWORD="test",
+        MAIL_FROM="test@example.com",
+        MAIL_PORT=PORT,
+        MAIL_SERVER=HOST,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+    )
+
+
+def test_pool_reuses_connections_across_batches():
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    handler = RecordingHandler()
+    controller = controller_module.Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+
+    async def main():
+        pool = SMTPPool(local_config(), size=2, max_messages_per_connection=1000)
+        opened = metrics.counters["mail.smtp_connections_opened"]
+
+        failures = []
+        for batch in range(3):
+            emails = [
+                build_email([f"user{batch}-{i}@example.com"], "Verify", "<p>hi</p>")
+                for i in range(10)
+            ]
+            failures += await pool.send(emails)
+
+        opened = metrics.counters["mail.smtp_connections_opened"] - opened
+        await pool.close()
+        return failures, opened
+
+    try:
+        failures, opened = asyncio.run(main())
+    finally:
+        controller.stop()
+
+    assert failures == []
+    assert len(handler.recipients) == 30
+    assert opened == 2
+
+
+def test_email_templates_are_compiled_once_and_escaped():
+    assert get_email_template("verify_email") is get_email_template("verify_email")
+
+    message = render_email(
+        ["a@b.com"], "verify_email", {"link": 'http://x/"><script>'}
+    )
+
+    assert message["Subject"] == "Email Verification"
+    assert "<script>" not in message.get_content()
+    assert "&#34;&gt;&lt;script&gt;" in message.get_content()
+
+
+def test_worker_builds_templated_and_plain_messages():
+    templated = build_message(
+        {"recipients": ["a@b.com"], "template": "password_reset", "context": {"link": "L"}}
+    )
+    plain = build_message(
+        {"recipients": ["a@b.com"], "template": None, "subject": "Hi", "body": "<b>x</b>"}
+    )
+
+    assert templated["Subject"] == "Reset your password"
+    assert 'href="L"' in templated.get_content()
+    assert plain["Subject"] == "Hi"
+
+
+def test_broadcasts_are_routed_away_from_transactional_mail():
+    assert email_queue({"template": "welcome"}) == BULK_QUEUE
+    assert email_queue({"template": "verify_email"}) == TRANSACTIONAL_QUEUE
+    assert email_queue({"template": None, "subject": "Hi"}) == TRANSACTIONAL_QUEUE
+
+
+def test_coalescing_keeps_the_latest_message_per_address():
+    messages = [
+        {"recipients": ["A@b.com"], "template": "verify_email", "context": {"link": "1"}},
+        {"recipients": ["c@d.com"], "template": "verify_email", "context": {"link": "2"}},
+        {"recipients": ["a@b.com"], "template": "verify_email", "context": {"link": "3"}},
+        {"recipients": ["a@b.com"], "template": None, "subject": "Hi", "body": "x"},
+        {"recipients": ["a@b.com"], "template": None, "subject": "Hi", "body": "x"},
+    ]
+
+    coalesced = coalesce_messages(messages)
+
+    assert [m.get("context") for m in coalesced[:2]] == [{"link": "3"}, {"link": "2"}]
+    assert len(coalesced) == 4
+
+
+def test_repeated_sends_are_suppressed_within_the_dedup_window(test_redis):
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    handler = RecordingHandler()
+    controller = controller_module.Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+    address = f"{uuid.uuid4().hex}@example.com"
+
+    def message(template, link=None):
+        context = {"link": link} if link else {}
+        return {"recipients": [address], "template": template, "context": context}
+
+    async def main():
+        pool = SMTPPool(local_config(), size=2, max_messages_per_connection=1000)
+        suppressed = metrics.counters["mail.suppressed"]
+
+        batches = [
+            # coalesced into the last one
+            [message("password_reset", "1"), message("password_reset", "2")],
+            # a redelivery of the same email
+            [message("password_reset", "2")],
+            # a newer link replaces the one sent
+            [message("password_reset", "3")],
+            [message("welcome"), message("welcome")],
+            [message("welcome")],
+        ]
+        failures = []
+        for batch in batches:
+            failures += (await send_messages(pool, batch))[1]
+
+        suppressed = metrics.counters["mail.suppressed"] - suppressed
+        await pool.close()
+        await close_redis()
+        return failures, suppressed
+
+    try:
+        failures, suppressed = asyncio.run(main())
+    finally:
+        controller.stop()
+
+    assert failures == []
+    assert handler.links == ["2", "3", None]
+    assert suppressed == 4
+
+
+def test_claims_of_crashed_sends_expire(monkeypatch, test_redis):
+    monkeypatch.setattr(Config, "EMAIL_DEDUP_INFLIGHT_TTL", 1)
+    message = {
+        "recipients": [f"{uuid.uuid4().hex}@example.com"],
+        "template": "verify_email",
+        "context": {"link": "x"},
+    }
+
+    async def main():
+        # a worker claims the send and dies before confirming it
+        claimed, _ = await claim_messages([message])
+        during, _ = await claim_messages([dict(message)])
+        await asyncio.sleep(1.1)
+        redelivered, _ = await claim_messages([dict(message)])
+        await close_redis()
+        return claimed, during, redelivered
+
+    claimed, during, redelivered = asyncio.run(main())
+
+    assert len(claimed) == 1
+    assert during == []
+    assert len(redelivered) == 1
+
+
+def test_undelivered_messages_are_retried(monkeypatch, test_redis):
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    addresses = [f"{uuid.uuid4().hex}@example.com" for _ in range(3)]
+    handler = RefusingHandler({addresses[0]})
+    controller = controller_module.Controller(handler, hostname=HOST, port=PORT)
+    controller.start()
+
+    # the worker process' loop and pool, pointed at the local server
+    loop = asyncio.new_event_loop()
+    pool = SMTPPool(local_config(), size=1, max_messages_per_connection=1000)
+    monkeypatch.setattr(celery_tasks, "mail_loop", loop)
+    monkeypatch.setattr(celery_tasks, "smtp_pool", pool)
+    monkeypatch.setattr(Config, "MAIL_RETRY_DELAY", 0)
+
+    messages = [
+        {"recipients": [address], "template": "verify_email", "context": {"link": "x"}}
+        for address in addresses
+    ]
+    try:
+        # apply() runs the task and its retries in this process
+        result = send_email_batch.apply((messages,))
+    finally:
+        loop.run_until_complete(pool.close())
+        loop.run_until_complete(close_redis())
+        loop.close()
+        controller.stop()
+
+    assert result.successful()
+    assert sorted(handler.recipients) == sorted(addresses)
+    # only the refused message went out again
+    assert handler.recipients[-1] == addresses[0]
@@ -0,0 +1,91 @@
+from src.db.models import EmailOutbox
+from src.outbox import outbox_email, queue_emails, relay_batch
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import select
+import asyncio
+import pytest
+
+QUEUED = 250
+
+
+def test_relay_delivers_each_email_once_and_survives_broker_errors(scratch_engine):
+    dispatched = []
+
+    def broker_down(messages):
+        raise ConnectionError("broker unavailable")
+
+    def recording_dispatch(messages):
+        dispatched.extend(message["recipients"][0] for message in messages)
+
+    async def main():
+        engine = scratch_engine()
+        Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def queued() -> int:
+            async with Session() as session:
+                return await session.scalar(select(func.count()).select_from(EmailOutbox))
+
+        try:
+            async with Session() as session:
+                session.add_all(
+                    outbox_email([f"user{i}@example.com"], "verify_email", {"link": "x"})
+                    for i in range(QUEUED)
+                )
+                await session.commit()
+
+            async with Session() as session:
+                with pytest.raises(ConnectionError):
+                    await relay_batch(session, 100, dispatch=broker_down)
+            left_after_outage = await queued()
+
+            async def drain():
+                relayed = 0
+                while True:
+                    async with Session() as session:
+                        count = await relay_batch(
+                            session, 30, dispatch=recording_dispatch
+                        )
+                    if not count:
+                        return relayed
+                    relayed += count
+
+            relayed = await asyncio.gather(drain(), drain(), drain())
+            return left_after_outage, relayed, await queued()
+        finally:
+            await engine.dispose()
+
+    left_after_outage, relayed, left = asyncio.run(main())
+
+    assert left_after_outage == QUEUED
+    assert sum(relayed) == QUEUED
+    assert sorted(dispatched) == sorted(f"user{i}@example.com" for i in range(QUEUED))
+    assert left == 0
+
+
+def test_newer_reset_email_replaces_the_pending_one(scratch_engine):
+    async def main():
+        engine = scratch_engine()
+        try:
+            for link in ["old", "new"]:
+                async with AsyncSession(engine, expire_on_commit=False) as session:
+                    await queue_emails(
+                        [
+                            outbox_email(["a@b.com"], "password_reset", {"link": link}),
+                            outbox_email(["a@b.com"], "welcome", {}),
+                        ],
+                        session,
+                    )
+
+            async with AsyncSession(engine) as session:
+                rows = (await session.execute(select(EmailOutbox))).scalars().all()
+                return sorted((row.template, row.context.get("link")) for row in rows)
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(main()) == [
+        ("password_reset", "new"),
+        ("welcome", None),
+        ("welcome", None),
+    ]
@@ -0,0 +1,88 @@
+from src.db import main
+from src.db.redis import close_redis
+from src.db.main import PrimarySession, ReadRouter, build_sessionmaker
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from types import SimpleNamespace
+import asyncio
+import uuid
+
+DATABASES = ["primary", "replica_0", "replica_1"]
+
+
+async def stand_ins(tmp_path):
+    """One SQLite file per database, each answering with its own name."""
+    engines = {}
+    for name in DATABASES:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        async with engine.begin() as conn:
+            await conn.execute(text("create table whoami (name text)"))
+            await conn.execute(text(f"insert into whoami values ('{name}')"))
+        engines[name] = engine
+
+    router = ReadRouter(
+        build_sessionmaker(engines["primary"], PrimarySession),
+        [build_sessionmaker(engines["replica_0"]), build_sessionmaker(engines["replica_1"])],
+    )
+    return engines, router
+
+
+async def whoami(session_factory) -> str:
+    async with session_factory() as session:
+        return await session.scalar(text("select name from whoami"))
+
+
+def test_reads_are_balanced_across_replicas(tmp_path):
+    async def main():
+        engines, router = await stand_ins(tmp_path)
+        names = [await whoami(router.pick(pinned=False)) for _ in range(4)]
+        pinned = await whoami(router.pick(pinned=True))
+        for engine in engines.values():
+            await engine.dispose()
+        return names, pinned
+
+    names, pinned = asyncio.run(main())
+
+    assert names == ["replica_0", "replica_1", "replica_0", "replica_1"]
+    assert pinned == "primary"
+
+
+def fake_request(user_uid: str):
+    return SimpleNamespace(
+        state=SimpleNamespace(token_data={"user": {"user_uid": user_uid}})
+    )
+
+
+def test_writer_reads_from_primary_after_commit(tmp_path, monkeypatch, test_redis):
+    writer, other = str(uuid.uuid4()), str(uuid.uuid4())
+
+    async def read_as(user_uid: str) -> str:
+        sessions = main.get_read_session(fake_request(user_uid))
+        session = await anext(sessions)
+        try:
+            return await session.scalar(text("select name from whoami"))
+        finally:
+            await sessions.aclose()
+
+    async def run():
+        engines, router = await stand_ins(tmp_path)
+        monkeypatch.setattr(main, "read_router", router)
+
+        before = await read_as(writer)
+        async with router.primary() as session:
+            session.info["request"] = fake_request(writer)
+            await session.execute(text("insert into whoami values ('written')"))
+            await session.commit()
+
+        after = [await read_as(writer), await read_as(other)]
+
+        for engine in engines.values():
+            await engine.dispose()
+        await close_redis()
+        return before, after
+
+    before, after = asyncio.run(run())
+
+    assert before.startswith("replica")
+    assert after[0] == "primary"
+    assert after[1].startswith("replica")
@@ -0,0 +1,82 @@
+from src.db.models import Book, Review
+from src.reviews.service import ReviewService, rating_delta_statement
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+import asyncio
+
+
+def new_book(title: str) -> Book:
+    return Book(
+        title=title,
+        author="Frank Herbert",
+        publisher="Chilton",
+        published_year=1965,
+        language="en",
+        pages=412,
+    )
+
+
+def test_rating_deltas_and_repair_keep_updated_at(scratch_engine):
+    async def main():
+        engine = scratch_engine()
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                rated, unrated = new_book("Dune"), new_book("Dune Messiah")
+                session.add_all([rated, unrated])
+                await session.commit()
+                updated_at = rated.updated_at
+
+                async def aggregates(book):
+                    row = (
+                        await session.execute(
+                            select(
+                                Book.rating_sum,
+                                Book.rating_count,
+                                Book.average_rating,
+                                Book.updated_at,
+                                Book.reviews_version,
+                            ).where(Book.uid == book.uid)
+                        )
+                    ).one()
+                    return tuple(row)
+
+                for rating in [5, 4, 3]:
+                    session.add(Review(rating=rating, review_text="ok", book_uid=rated.uid))
+                    await session.execute(rating_delta_statement(rated.uid, rating, 1))
+                await session.commit()
+                added = await aggregates(rated)
+
+                await session.execute(delete(Review).where(Review.rating == 3))
+                await session.execute(rating_delta_statement(rated.uid, -3, -1))
+                await session.commit()
+                deleted = await aggregates(rated)
+
+                # drift the aggregates of both books, then repair them
+                await session.execute(
+                    update(Book).values(
+                        rating_sum=1, rating_count=1, updated_at=Book.updated_at
+                    )
+                )
+                await session.commit()
+                repaired = await ReviewService().repair_rating_aggregates(session)
+
+                return (
+                    updated_at,
+                    added,
+                    deleted,
+                    repaired,
+                    await aggregates(rated),
+                    await aggregates(unrated),
+                )
+        finally:
+            await engine.dispose()
+
+    updated_at, added, deleted, repaired, rated, unrated = asyncio.run(main())
+
+    assert added == (12, 3, 4.0, updated_at, 3)
+    assert deleted == (9, 2, 4.5, updated_at, 4)
+    assert repaired == 2
+    assert rated == (9, 2, 4.5, updated_at, 5)
+    assert unrated[:3] == (0, 0, None)
+    assert unrated[4] == 1
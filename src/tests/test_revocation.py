@@ -0,0 +1,80 @@
+from src.db.revocation import RevocationMirror, revoke
+import redis.asyncio as aioredis
+import asyncio
+import os
+import random
+import time
+import uuid
+import pytest
+
+TEST_REDIS_URL = os.environ.get("TEST_REDIS_URL")
+
+needs_redis = pytest.mark.skipif(
+    TEST_REDIS_URL is None, reason="needs a Redis server in TEST_REDIS_URL"
+)
+
+
+def test_revoked_jti_expires_from_mirror():
+    mirror = RevocationMirror(get_client=None)
+
+    mirror.add("live", time.time() + 60)
+    mirror.add("expired", time.time() - 1)
+    mirror.apply(b'{"jti": "published", "expires_at": %f}' % (time.time() + 60))
+    mirror.apply(b"not json")
+
+    assert mirror.contains("live")
+    assert mirror.contains("published")
+    assert not mirror.contains("expired")
+    assert not mirror.contains("never-revoked")
+
+    mirror.prune()
+    assert set(mirror.revoked) == {"live", "published"}
+
+
+async def converge(mirrors, revoked, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(mirror.contains(jti) for mirror in mirrors for jti in revoked):
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+@needs_redis
+def test_workers_agree_on_revocations():
+    async def main():
+        client = aioredis.from_url(TEST_REDIS_URL)
+        workers = [RevocationMirror(lambda: client) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        assert all([await worker.wait_ready(5) for worker in workers])
+
+        revoked = []
+        for i in range(60):
+            jti = str(uuid.uuid4())
+            await revoke(client, jti, ttl=60)
+            revoked.append(jti)
+
+            # workers that start mid-stream must pick up earlier revocations
+            # from Redis and later ones from the channel
+            if i % 20 == 10:
+                late = RevocationMirror(lambda: client)
+                late.start()
+                workers.append(late)
+            await asyncio.sleep(random.random() / 1000)
+
+        assert all([await worker.wait_ready(5) for worker in workers])
+        assert await converge(workers, revoked)
+        assert not any(worker.contains(str(uuid.uuid4())) for worker in workers)
+
+        short_lived = str(uuid.uuid4())
+        await revoke(client, short_lived, ttl=1)
+        assert await converge(workers, [short_lived])
+        await asyncio.sleep(1.1)
+        assert not any(worker.contains(short_lived) for worker in workers)
+
+        for worker in workers:
+            await worker.stop()
+        await client.aclose()
+
+    asyncio.run(main())
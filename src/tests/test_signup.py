@@ -0,0 +1,47 @@
+from src.auth.schemas import UserCreateModel
+from src.auth.service import UserService
+from src.db.models import User
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+import asyncio
+
+CONCURRENT_SIGNUPS = 16
+
+
+def test_concurrent_signups_create_one_user(scratch_engine):
+    user_data = UserCreateModel(
+        username="racer",
+        email="racer@example.com",
+        password="helloworld1",
+        first_name="race",
+        last_name="condition",
+    )
+
+    async def main():
+        engine = scratch_engine(pool_size=CONCURRENT_SIGNUPS)
+
+        async def signup():
+            async with AsyncSession(engine) as session:
+                return await UserService().create_user(user_data, session)
+
+        try:
+            results = await asyncio.gather(
+                *(signup() for _ in range(CONCURRENT_SIGNUPS))
+            )
+
+            async with AsyncSession(engine) as session:
+                count = await session.scalar(
+                    select(func.count()).where(User.email == user_data.email)
+                )
+            return results, count
+        finally:
+            await engine.dispose()
+
+    results, count = asyncio.run(main())
+
+    created = [user for user in results if user is not None]
+    assert len(created) == 1
+    assert created[0]["email"] == user_data.email
+    assert "password" not in created[0]
+    assert count == 1